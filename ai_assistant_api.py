@@ -2,7 +2,8 @@ import json
 from datetime import date
 import streamlit as st
 import pandas as pd
-import openai
+from sleep_data import parse_datetimes
+from sleep_stats import summarize
 
 class AIAssistantAPI:
     def __init__(self):
@@ -16,6 +17,7 @@ class AIAssistantAPI:
                 api_key = st.secrets.get("openai_api_key")
                 if not api_key:
                     raise ValueError("OpenAI API key not found in secrets")
+                import openai
                 self.client = openai.OpenAI(api_key=api_key)
             except Exception as e:
                 raise ValueError(f"Failed to initialize OpenAI client: {str(e)}")
@@ -85,11 +87,20 @@ class AIAssistantAPI:
     def _summarize_sleep_data(self, data):
         """Format sleep data as text for the AI prompt."""
         summary = f"Sleep data for last {len(data)} entries:\n"
+        if 'sleep_start_datetime' not in data.columns or 'sleep_end_datetime' not in data.columns:
+            return summary
         
-        for _, row in data.iterrows():
-            if 'sleep_start' in row and 'sleep_end' in row:
-                summary += f"- Date: {row.get('date', 'Unknown')}, Sleep: {row.get('sleep_start', 'N/A')} to {row.get('sleep_end', 'N/A')}\n"
+        start = parse_datetimes(data['sleep_start_datetime'])
+        end = parse_datetimes(data['sleep_end_datetime'])
+        for start_dt, end_dt in zip(start, end):
+            if pd.notna(start_dt) and pd.notna(end_dt):
+                summary += f"- Date: {start_dt:%Y-%m-%d}, Sleep: {start_dt:%H:%M} to {end_dt:%H:%M}\n"
         
+        stats = summarize(start, end)
+        if stats["nights"]:
+            summary += (f"Average: {stats['duration_mean']:.1f} hours per night, "
+                        f"bedtime {stats['bedtime_mean']:%H:%M} (±{stats['bedtime_std_min']:.0f} min), "
+                        f"wake time {stats['wake_mean']:%H:%M} (±{stats['wake_std_min']:.0f} min)\n")
         return summary
     
     def _summarize_nutrition_data(self, data):
@@ -304,7 +315,7 @@ Be personal, comprehensive, and motivating. Provide 3-4 key insights that help t
                     summary += f"\n{data_type.upper()}:\n"
                     for _, row in df.iterrows():
                         if data_type == "sleep":
-                            summary += f"- Sleep: {row.get('sleep_start', 'N/A')} to {row.get('sleep_end', 'N/A')}\n"
+                            summary += f"- Sleep: {row.get('sleep_start_datetime', 'N/A')} to {row.get('sleep_end_datetime', 'N/A')}\n"
                         elif data_type == "nutrition":
                             summary += f"- Water: {row.get('water_ml', 0)}ml\n"
                             if row.get('breakfast'):
@@ -1,6 +1,8 @@
 import os
 import base64
 import streamlit as st
+from table_cache import start_archival, start_warmup
+from write_queue import write_queue
 
 DATA_DIR = "data"
 HEADER_SVG = "images/BeWell360-lg.svg"
@@ -56,17 +58,26 @@ challenges_pages = create_pages([
     ("the_yukon_63k.py", "The Yukon 63K", "❄️"),
 ])
 
+data_pages = create_pages([
+    ("history_import.py", "Import History", "📥"),
+    ("data_export.py", "Export Data", "📦"),
+])
+
 pages = {
     "Daily Log": daily_log_pages,
     "Insights & Coach": ai_pages,
     "Goals & Vision": goals_pages,
     "Challenges": challenges_pages,
+    "Data": data_pages,
 }
 
+write_queue.start()
+start_warmup()
 nav = st.navigation(pages)
 nav.run()
 
 os.makedirs(DATA_DIR, exist_ok=True)
+start_archival()
 
 footer_b64 = load_svg(FOOTER_SVG)
 footer_img = f'<img src="data:image/svg+xml;base64,{footer_b64}" width="150">' if footer_b64 else ""
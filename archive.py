@@ -0,0 +1,119 @@
+import os
+import threading
+import pandas as pd
+import streamlit as st
+from schema import ROW_ID_COLUMN, row_dates
+
+ARCHIVE_DIR = os.path.join("data", "archive")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def enabled():
+    """True if archival is switched on with [archive] enabled = true in secrets.
+
+    Off by default: the archive lives on local disk, which hosted deployments may lose,
+    so ARCHIVE_DIR should be on durable storage before closed years leave the live tables.
+    """
+    try:
+        return bool(st.secrets.get("archive", {}).get("enabled", False))
+    except FileNotFoundError:
+        return False
+
+
+def year_path(name, year):
+    """Parquet file holding a table's archived rows for one year."""
+    return os.path.join(ARCHIVE_DIR, name, f"{int(year)}.parquet")
+
+
+def years(name):
+    """Return the archived years of a table, oldest first."""
+    try:
+        files = os.listdir(os.path.join(ARCHIVE_DIR, name))
+    except OSError:
+        return []
+    return sorted(int(f[:-8]) for f in files if f.endswith(".parquet") and f[:-8].isdigit())
+
+
+def read_year(name, year):
+    """Return a table's archived rows for one year, cached until the file changes."""
+    path = year_path(name, year)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return pd.DataFrame()
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    df = pd.read_parquet(path)
+    with _cache_lock:
+        _cache[path] = (mtime, df)
+    return df
+
+
+def write_year(name, year, rows):
+    """Merge typed rows into a year's archive file (atomically replaced; re-archiving the same rows is a no-op)."""
+    rows = rows.copy()
+    for col in rows.columns:
+        if rows[col].dtype == object:
+            rows[col] = rows[col].astype("string")
+    existing = read_year(name, year)
+    if not existing.empty:
+        rows = pd.concat([existing, rows], ignore_index=True).drop_duplicates(ignore_index=True)
+    path = year_path(name, year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        rows.to_parquet(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def stored_ids(name, year):
+    """Row IDs in a year's archive file as read back from disk (bypassing the cache)."""
+    try:
+        df = pd.read_parquet(year_path(name, year), columns=[ROW_ID_COLUMN])
+    except (OSError, ValueError, KeyError):
+        return set()
+    return set(df[ROW_ID_COLUMN].dropna().astype(str))
+
+
+def drop_live(archived, live):
+    """Drop archived rows whose row ID is still in the live table, which wins.
+
+    Such rows are left behind when an archival run wrote the archive but its delete
+    from the live table never landed.
+    """
+    if archived.empty or ROW_ID_COLUMN not in archived.columns or ROW_ID_COLUMN not in live.columns:
+        return archived
+    return archived[~archived[ROW_ID_COLUMN].astype(str).isin(live[ROW_ID_COLUMN].astype(str))]
+
+
+def read_range(name, start, end):
+    """Return archived rows dated between `start` and `end` (inclusive), oldest year first."""
+    frames = []
+    for year in years(name):
+        if start.year <= year <= end.year:
+            df = read_year(name, year)
+            if df.empty:
+                continue
+            dates = row_dates(name, df)
+            frames.append(df[(dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))])
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def date_bounds(name):
+    """Return the (first, last) archived date of a table, or (None, None)."""
+    archived = years(name)
+    if not archived:
+        return None, None
+    first = row_dates(name, read_year(name, archived[0])).dropna()
+    last = row_dates(name, read_year(name, archived[-1])).dropna()
+    if first.empty or last.empty:
+        return None, None
+    return first.min().date(), last.max().date()
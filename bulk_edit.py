@@ -0,0 +1,47 @@
+import pandas as pd
+import streamlit as st
+from schema import ROW_ID_COLUMN
+
+
+def render_bulk_editor(table, column, key, label="Item"):
+    """Edit or delete many items of a one-column list at once: one batched write per action, then one rerun."""
+    df = table.frame()
+    if df.empty or column not in df.columns or ROW_ID_COLUMN not in df.columns:
+        return
+    texts = df[column].astype(str).str.strip()
+    items = df[texts != ""]
+    original = pd.DataFrame({"Select": False, label: texts[texts != ""].to_numpy()}, index=items[ROW_ID_COLUMN].to_numpy())
+
+    with st.expander("Bulk edit", expanded=False):
+        edited = st.data_editor(
+            original,
+            key=f"bulk_editor_{key}",
+            hide_index=True,
+            num_rows="fixed",
+            column_config={"Select": st.column_config.CheckboxColumn("Select", width="small")},
+            use_container_width=True,
+        )
+        selected = edited.index[edited["Select"]].tolist()
+        changed = {
+            row_id: [str(text).strip()]
+            for row_id, text in edited[label].items()
+            if row_id not in selected and str(text).strip() and str(text).strip() != original.at[row_id, label]
+        }
+
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            if st.button(f"🗑️ Delete selected ({len(selected)})", key=f"bulk_delete_{key}", disabled=not selected):
+                try:
+                    table.delete_by_ids(selected)
+                    st.success(f"Deleted {len(selected)} item(s).")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error deleting: {str(e)}")
+        with col2:
+            if st.button(f"☁️ Save edits ({len(changed)})", key=f"bulk_save_{key}", disabled=not changed):
+                try:
+                    table.update_by_ids(changed)
+                    st.success(f"Updated {len(changed)} item(s).")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error saving: {str(e)}")
@@ -1,71 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 import gspread
-from google.oauth2.service_account import Credentials
 import pandas as pd
 import streamlit as st
 from ai_assistant_api import ai_assistant
-
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-
-def load_ai_insights():
-    try:
-        ws = client.open("daily_ai_insights").sheet1
-        df = pd.DataFrame(ws.get_all_records())
-        if not df.empty:
-            df["date"] = pd.to_datetime(df["date"])
-        return df
-    except (gspread.SpreadsheetNotFound, gspread.APIError, KeyError, ValueError):
-        return pd.DataFrame()
+from storage import get_backend
+from table_cache import get_table
+
+DAY_TABLES = {
+    "nutrition": "nutrition_and_hydration",
+    "fitness": "fitness_activities",
+    "sleep": "sleep_schedule",
+    "insights": "daily_ai_insights",
+}
 
 def save_ai_insights(date, section, insights):
     try:
-        try:
-            ws = client.open("daily_ai_insights").sheet1
-        except gspread.SpreadsheetNotFound:
-            sh = client.create("daily_ai_insights")
-            ws = sh.sheet1
-            ws.append_row(["date", "section", "ai_insights"])
-        
-        ws.append_row([date.strftime('%Y-%m-%d'), section, insights])
+        get_backend().ensure_table("daily_ai_insights", ["date", "section", "ai_insights"])
+        get_table("daily_ai_insights").append_row([date.strftime('%Y-%m-%d'), section, insights])
         return True
     except (gspread.SpreadsheetNotFound, gspread.APIError, KeyError, ValueError):
         return False
 
-def get_user_data_for_date(selected_date):
-    """Load user data for the given date from nutrition, fitness, and sleep sheets."""
-    user_data = {}
-    sheets_data = {
-        "nutrition": "nutrition_and_hydration",
-        "fitness": "fitness_activities", 
-        "sleep": "sleep_schedule",
-    }
-    
-    for data_type, sheet_name in sheets_data.items():
-        try:
-            ws = client.open(sheet_name).sheet1
-            df = pd.DataFrame(ws.get_all_records())
-            if not df.empty and 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                date_filtered = df[df['date'].dt.date == selected_date]
-                user_data[data_type] = date_filtered
-            else:
-                user_data[data_type] = pd.DataFrame()
-        except (gspread.SpreadsheetNotFound, gspread.APIError, KeyError, ValueError):
-            user_data[data_type] = pd.DataFrame()
-    
-    return user_data
+def read_day(sheet_name, selected_date, refresh=False):
+    """Return the rows of one table logged on the given date; only that day is fetched unless the table is cached."""
+    try:
+        table = get_table(sheet_name)
+        if refresh and table.df is not None:
+            table.refresh()
+        return table.read_range(selected_date, selected_date)
+    except (gspread.SpreadsheetNotFound, gspread.APIError, KeyError, ValueError):
+        return pd.DataFrame()
 
-if "ai_insights_data" not in st.session_state:
-    st.session_state.ai_insights_data = load_ai_insights()
+def get_user_data_for_date(selected_date, refresh=False):
+    """Load the day's nutrition, fitness, sleep and stored insights, fetching the sheets concurrently."""
+    with ThreadPoolExecutor(max_workers=len(DAY_TABLES)) as pool:
+        days = {data_type: pool.submit(read_day, sheet_name, selected_date, refresh)
+                for data_type, sheet_name in DAY_TABLES.items()}
+    return {data_type: day.result() for data_type, day in days.items()}
 
 st.title("🦉 Daily Summary")
 
@@ -75,9 +47,7 @@ selected_date = st.date_input(
     help="Choose the date for your AI summary."
 )
 
-if st.button("🔄 Refresh insights"):
-    st.session_state.ai_insights_data = load_ai_insights()
-    st.rerun()
+refresh_clicked = st.button("🔄 Refresh insights")
 
 sections = {
     "🍎": "Nutrition & Hydration",
@@ -85,7 +55,8 @@ sections = {
     "🧸": "Sleep Schedule",
 }
 
-user_data = get_user_data_for_date(selected_date)
+user_data = get_user_data_for_date(selected_date, refresh=refresh_clicked)
+stored_insights = user_data.pop("insights")
 
 has_data = any(not df.empty for df in user_data.values())
 if not has_data:
@@ -106,10 +77,6 @@ for i, (data_type, icon) in enumerate(zip(data_types, data_icons)):
             help=f"{data_type.title()} data logged" if has_data_for_type else f"No {data_type} data"
         )
 
-stored_insights = st.session_state.ai_insights_data[
-    st.session_state.ai_insights_data['date'].dt.date == selected_date
-] if not st.session_state.ai_insights_data.empty else pd.DataFrame()
-
 for icon, section_name in sections.items():
     st.markdown(f"### {icon} {section_name}")
     
@@ -1,18 +1,7 @@
 from datetime import date
-import gspread
-from google.oauth2.service_account import Credentials
-import pandas as pd
 import streamlit as st
-
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-]
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES,
-)
-client = gspread.authorize(creds)
+from bulk_edit import render_bulk_editor
+from table_cache import get_table
 
 ROUTINE_SECTIONS = [
     ("morning", "empowering_morning_routine", "empowering_morning_routine", "Morning Routine", "☀️"),
@@ -28,16 +17,9 @@ def get_checklist_key(section_id):
     return f"daily_checklist_{section_id}_{today_str}"
 
 
-def get_df_key(section_id):
-    return f"routine_df_{section_id}"
-
-
-def render_section(client, section_id, sheet_name, column_name, section_label, icon):
-    ws = client.open(sheet_name).sheet1
-    df_key = get_df_key(section_id)
+def render_section(section_id, sheet_name, column_name, section_label, icon):
+    table = get_table(sheet_name)
     checklist_key = get_checklist_key(section_id)
-    if df_key not in st.session_state:
-        st.session_state[df_key] = pd.DataFrame(ws.get_all_records())
     if checklist_key not in st.session_state:
         st.session_state[checklist_key] = {}
 
@@ -48,13 +30,14 @@ def render_section(client, section_id, sheet_name, column_name, section_label, i
         st.session_state[f"new_input_empty_{section_id}"] = ""
 
     st.subheader(f"{icon} {section_label}")
-    df = st.session_state[df_key]
+    df = table.frame()
     checklist = st.session_state[checklist_key]
     show_management = st.session_state.get(show_mgmt_key, False)
 
     if not df.empty:
-        for idx, row in df.iterrows():
-            item_key = f"item_{section_id}_{idx}"
+        for _, row in df.iterrows():
+            row_id = row["row_id"]
+            item_key = f"item_{section_id}_{row_id}"
             item_name = str(row.get(column_name, "")).strip()
             if not item_name:
                 continue
@@ -68,34 +51,32 @@ def render_section(client, section_id, sheet_name, column_name, section_label, i
                     )
                     checklist[item_key] = checked
                 with col2:
-                    if st.button("✏️", key=f"edit_{section_id}_{idx}", help="Edit", use_container_width=True):
-                        st.session_state[f"editing_{section_id}_{idx}"] = True
+                    if st.button("✏️", key=f"edit_{section_id}_{row_id}", help="Edit", use_container_width=True):
+                        st.session_state[f"editing_{section_id}_{row_id}"] = True
                 with col3:
-                    if st.button("🗑️", key=f"delete_{section_id}_{idx}", help="Delete", use_container_width=True):
+                    if st.button("🗑️", key=f"delete_{section_id}_{row_id}", help="Delete", use_container_width=True):
                         try:
-                            ws.delete_rows(idx + 2)
+                            table.delete_by_id(row_id)
                             st.success(f"Deleted from {section_label}.")
-                            st.session_state[df_key] = pd.DataFrame(ws.get_all_records())
                             st.rerun()
                         except Exception as e:
                             st.error(f"Error deleting: {str(e)}")
-                if st.session_state.get(f"editing_{section_id}_{idx}", False):
+                if st.session_state.get(f"editing_{section_id}_{row_id}", False):
                     with st.expander(f"Edit: {item_name}", expanded=True):
-                        edit_val = st.text_input("", value=item_name, key=f"edit_input_{section_id}_{idx}")
+                        edit_val = st.text_input("", value=item_name, key=f"edit_input_{section_id}_{row_id}")
                         ec1, ec2 = st.columns([1, 1])
                         with ec1:
-                            if st.button("☁️ Save changes", key=f"save_edit_{section_id}_{idx}"):
+                            if st.button("☁️ Save changes", key=f"save_edit_{section_id}_{row_id}"):
                                 try:
-                                    ws.update(values=[[edit_val]], range_name=f"A{idx+2}")
+                                    table.update_by_id(row_id, [edit_val])
                                     st.success("Updated.")
-                                    st.session_state[f"editing_{section_id}_{idx}"] = False
-                                    st.session_state[df_key] = pd.DataFrame(ws.get_all_records())
+                                    st.session_state[f"editing_{section_id}_{row_id}"] = False
                                     st.rerun()
                                 except Exception as e:
                                     st.error(f"Error: {str(e)}")
                         with ec2:
-                            if st.button("❌ Cancel", key=f"cancel_edit_{section_id}_{idx}"):
-                                st.session_state[f"editing_{section_id}_{idx}"] = False
+                            if st.button("❌ Cancel", key=f"cancel_edit_{section_id}_{row_id}"):
+                                st.session_state[f"editing_{section_id}_{row_id}"] = False
                                 st.rerun()
             else:
                 checked = st.checkbox(
@@ -117,15 +98,15 @@ def render_section(client, section_id, sheet_name, column_name, section_label, i
                     st.rerun()
             if add_clicked and new_val and new_val.strip():
                 try:
-                    ws.append_row([new_val.strip()])
+                    table.append_row([new_val.strip()])
                     st.success(f"Added to {section_label}.")
-                    st.session_state[df_key] = pd.DataFrame(ws.get_all_records())
                     st.session_state[f"_clear_new_input_{section_id}"] = True
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error adding: {str(e)}")
             elif add_clicked:
                 st.error("Please enter an item.")
+            render_bulk_editor(table, column_name, section_id)
 
         total = len([r for _, r in df.iterrows() if str(r.get(column_name, "")).strip()])
         checked_count = sum(1 for v in checklist.values() if v)
@@ -160,9 +141,8 @@ def render_section(client, section_id, sheet_name, column_name, section_label, i
                     st.rerun()
             if add_clicked and new_val and new_val.strip():
                 try:
-                    ws.append_row([new_val.strip()])
+                    table.append_row([new_val.strip()])
                     st.success(f"Added to {section_label}.")
-                    st.session_state[df_key] = pd.DataFrame(ws.get_all_records())
                     st.session_state[f"_clear_new_input_empty_{section_id}"] = True
                     st.rerun()
                 except Exception as e:
@@ -181,7 +161,6 @@ tab_morning, tab_evening, tab_other = st.tabs(["☀️ Morning Routine", "🌙 E
 
 with tab_morning:
     render_section(
-        client,
         "morning",
         "empowering_morning_routine",
         "empowering_morning_routine",
@@ -191,7 +170,6 @@ with tab_morning:
 
 with tab_evening:
     render_section(
-        client,
         "evening",
         "empowering_evening_routine",
         "empowering_evening_routine",
@@ -201,7 +179,6 @@ with tab_evening:
 
 with tab_other:
     render_section(
-        client,
         "other",
         "daily_empowering_habits",
         "daily_empowering_habits",
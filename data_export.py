@@ -0,0 +1,86 @@
+import base64
+import tempfile
+import zipfile
+from datetime import date
+import gspread
+import streamlit as st
+import archive
+from schema import ROW_ID_COLUMN, table_names
+from table_cache import get_table
+
+# Rows converted and written per step, so only one slice of a table is re-encoded at a time.
+EXPORT_CHUNK_ROWS = 5000
+# Tables whose base64 image column is also exported as individual JPEG files.
+IMAGE_TABLES = {"vision_board": "image_data"}
+
+
+def write_table(zf, arcname, df, fmt):
+    """Write one DataFrame into the archive as CSV or Parquet, chunk by chunk."""
+    if fmt == "csv":
+        with zf.open(f"{arcname}.csv", "w") as out:
+            for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+                chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS].astype("string")
+                out.write(chunk.to_csv(index=False, header=start == 0).encode("utf-8"))
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(str(c), pa.string()) for c in df.columns])
+        with zf.open(f"{arcname}.parquet", "w") as out, pq.ParquetWriter(out, schema) as writer:
+            for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+                chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS].astype("string")
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_images(zf, name, df, column):
+    """Decode a table's base64 images into <table>/images/<row id>.jpg."""
+    if column not in df.columns:
+        return
+    ids = df[ROW_ID_COLUMN] if ROW_ID_COLUMN in df.columns else df.index.astype(str)
+    for row_id, data in zip(ids, df[column]):
+        if isinstance(data, str) and data:
+            try:
+                zf.writestr(f"{name}/images/{row_id}.jpg", base64.b64decode(data), compress_type=zipfile.ZIP_STORED)
+            except ValueError:
+                continue
+
+
+def build_export(fmt):
+    """Write every table and its archived years into a ZIP on disk, one table at a time."""
+    out = tempfile.TemporaryFile()
+    skipped = []
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in table_names():
+            try:
+                # Tables nobody has open are read once and dropped, not pinned in the shared cache.
+                df = get_table(name).snapshot()
+            except (gspread.SpreadsheetNotFound, gspread.WorksheetNotFound, gspread.exceptions.APIError, PermissionError) as e:
+                # Not created yet (e.g. daily_ai_insights before the first summary), not shared, or refused.
+                skipped.append(f"{name}: {type(e).__name__}")
+                df = None
+            if df is not None and not df.empty:
+                write_table(zf, f"{name}/{name}", df, fmt)
+                if name in IMAGE_TABLES:
+                    write_images(zf, name, df, IMAGE_TABLES[name])
+            for year in archive.years(name):
+                if fmt == "parquet":
+                    zf.write(archive.year_path(name, year), f"{name}/archive/{year}.parquet")
+                else:
+                    write_table(zf, f"{name}/archive/{year}", archive.read_year(name, year), fmt)
+        if skipped:
+            zf.writestr("SKIPPED.txt", "Tables that could not be read and are not in this export:\n" + "\n".join(skipped) + "\n")
+    out.seek(0)
+    return out
+
+
+st.title("📦 Export Data")
+st.caption("Download everything you've logged, including archived years, AI insights and vision board images, as one ZIP file.")
+
+fmt = st.radio("File format", ["parquet", "csv"], format_func=lambda f: {"parquet": "Parquet", "csv": "CSV"}[f], horizontal=True)
+
+st.download_button(
+    "⬇️ Download export",
+    data=lambda: build_export(fmt),
+    file_name=f"bewell360_export_{date.today():%Y%m%d}.zip",
+    mime="application/zip",
+    on_click="ignore",
+)
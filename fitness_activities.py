@@ -1,23 +1,9 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from table_cache import get_table
 from datetime import date
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-ws = client.open("fitness_activities").sheet1
-
-if "fitness_df" not in st.session_state:
-    st.session_state.fitness_df = pd.DataFrame(ws.get_all_records())
+fitness_table = get_table("fitness_activities")
 
 st.title("⚽ Fitness Activities")
 
@@ -25,22 +11,13 @@ today = date.today()
 
 entry_date = st.date_input("Date", today)
 
-df_records = st.session_state.fitness_df.to_dict(orient="records")
-existing_row_idx, existing_row = None, None
-
-def match_row(row, d, ex):
-    row_date = str(row.get("date"))
-    row_ex = str(row.get("exercise", "")).strip().lower()
-    return row_date == str(d) and row_ex == ex.strip().lower()
+existing_row_id, existing_row = None, None
 
 exercise = st.text_input("Exercise", value="")
 
 if exercise:
-    for i, row in enumerate(df_records):
-        if match_row(row, entry_date, exercise):
-            existing_row_idx = i + 2
-            existing_row = row
-            break
+    existing_row = fitness_table.find(entry_date, exercise, columns=("date", "exercise"))
+    existing_row_id = existing_row["row_id"] if existing_row else None
 
 def as_int(val, default=0):
     try:
@@ -61,7 +38,7 @@ def as_float(val, default=0.0):
 prefill_sets = as_int(existing_row.get("sets")) if existing_row else 0
 prefill_reps = as_int(existing_row.get("reps")) if existing_row else 0
 prefill_weight = as_float(existing_row.get("weight_kg")) if existing_row else 0.0
-prefill_duration = as_int(existing_row.get("duration_sec")) if existing_row else 0
+prefill_duration = as_int(existing_row.get("duration_min")) if existing_row else 0
 prefill_distance = as_float(existing_row.get("distance_km")) if existing_row else 0.0
 
 col1, col2, col3 = st.columns(3)
@@ -82,21 +59,22 @@ col_save, col_delete = st.columns([1, 1])
 with col_save:
     save_clicked = st.button("☁️ Save")
 with col_delete:
-    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_idx is None))
+    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_id is None))
 
 if save_clicked:
     try:
         if not exercise.strip():
             st.error("Exercise name is required.")
         else:
-            if existing_row_idx:
-                ws.update(
-                    values=[[exercise, int(sets), int(reps), float(weight_kg), int(duration_min), float(distance_km)]],
-                    range_name=f"B{existing_row_idx}:G{existing_row_idx}"
+            if existing_row_id is not None:
+                fitness_table.update_by_id(
+                    existing_row_id,
+                    [exercise, int(sets), int(reps), float(weight_kg), int(duration_min), float(distance_km)],
+                    start_col=2
                 )
                 st.success(f"Updated fitness log for {entry_date} - {exercise}.")
             else:
-                ws.append_row([
+                fitness_table.append_row([
                     str(entry_date),
                     exercise,
                     int(sets),
@@ -106,41 +84,18 @@ if save_clicked:
                     float(distance_km)
                 ])
                 st.success(f"Added new fitness log for {entry_date} - {exercise}.")
-            st.session_state.fitness_df = pd.DataFrame(ws.get_all_records())
     except Exception as e:
         st.error(f"Error saving data: {str(e)}")
 
-if delete_clicked and existing_row_idx:
+if delete_clicked and existing_row_id is not None:
     try:
-        ws.delete_rows(existing_row_idx)
+        fitness_table.delete_by_id(existing_row_id)
         st.success(f"Deleted fitness log for {entry_date} - {exercise}.")
-        st.session_state.fitness_df = pd.DataFrame(ws.get_all_records())
     except Exception as e:
         st.error(f"Error deleting data: {str(e)}")
 
-if not st.session_state.fitness_df.empty:
-    df = st.session_state.fitness_df.copy()
-    df["date"] = pd.to_datetime(df["date"])
-    df["sets"] = pd.to_numeric(df.get("sets", 0), errors="coerce")
-    df["reps"] = pd.to_numeric(df.get("reps", 0), errors="coerce")
-    df["weight_kg"] = pd.to_numeric(df.get("weight_kg", 0), errors="coerce")
-    df["duration_sec"] = pd.to_numeric(df.get("duration_sec", 0), errors="coerce")
-    df["distance_km"] = pd.to_numeric(df.get("distance_km", 0.0), errors="coerce")
-
-    valid_dates = df["date"].dropna()
-    if valid_dates.empty:
-        st.warning("No valid dates found in the data.")
-        st.stop()
-
-    min_date = valid_dates.min().date()
-    max_date = valid_dates.max().date()
-    today_val = date.today()
-    try:
-        _ = min_date.year
-    except Exception:
-        min_date = today_val
-        max_date = today_val
-
+min_date, max_date = fitness_table.date_bounds()
+if min_date is not None:
     st.write("")
     st.write("")
     header_col, filter_col1, filter_col2 = st.columns([2, 1, 1])
@@ -156,13 +111,11 @@ if not st.session_state.fitness_df.empty:
         st.warning("Invalid date range: the start date cannot be after the end date.")
         filtered_df = pd.DataFrame()
     else:
-        filtered_df = df[(df["date"].dt.date >= start_filter) & (df["date"].dt.date <= end_filter)].copy()
+        filtered_df = fitness_table.read_range(start_filter, end_filter).copy()
 
     if not filtered_df.empty:
         # Weight Progression Chart
-        weighted_df = filtered_df.copy()
-        weighted_df["weight_kg"] = pd.to_numeric(weighted_df.get("weight_kg", 0), errors="coerce")
-        weighted_df = weighted_df.dropna(subset=["weight_kg"]) 
+        weighted_df = filtered_df.dropna(subset=["weight_kg"]) 
         weighted_df = weighted_df[weighted_df["weight_kg"] > 0]
 
         exercises_with_weight = (
@@ -254,9 +207,7 @@ if not st.session_state.fitness_df.empty:
             st.info("No exercises with weight data in the selected range.")
 
         # Distance Progression Chart
-        distance_df = filtered_df.copy()
-        distance_df["distance_km"] = pd.to_numeric(distance_df.get("distance_km", 0), errors="coerce")
-        distance_df = distance_df.dropna(subset=["distance_km"]) 
+        distance_df = filtered_df.dropna(subset=["distance_km"]) 
         distance_df = distance_df[distance_df["distance_km"] > 0]
 
         exercises_with_distance = (
@@ -359,18 +310,16 @@ if not st.session_state.fitness_df.empty:
             st.info("No exercises with distance data in the selected range.")
 
         # Interactive table
-        df_display = filtered_df.copy()
-        df_display = df_display.rename(columns={
+        df_display = filtered_df.drop(columns=["row_id"], errors="ignore").rename(columns={
             "date": "Date",
             "exercise": "Exercise",
             "sets": "Sets",
             "reps": "Reps",
             "weight_kg": "Weight (kg)",
+            "duration_min": "Duration (min)",
             "distance_km": "Distance (km)"
         })
-        df_display["Duration (min)"] = filtered_df["duration_sec"]
-        df_display = df_display.drop(columns=["duration_sec"])
-        df_display["Date"] = pd.to_datetime(df_display["Date"]).dt.date
+        df_display["Date"] = df_display["Date"].dt.date
         with st.expander("Log Entries", expanded=False):
             st.dataframe(df_display.sort_values(["Date", "Exercise"], ascending=[False, True]), width="stretch")
     else:
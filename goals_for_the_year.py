@@ -1,22 +1,8 @@
 import streamlit as st
-import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from bulk_edit import render_bulk_editor
+from table_cache import get_table
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-ws = client.open("goals_for_the_year").sheet1
-
-if "yearly_goals_df" not in st.session_state:
-    st.session_state.yearly_goals_df = pd.DataFrame(ws.get_all_records())
+goals_table = get_table("goals_for_the_year")
 
 if "yearly_goals_completed" not in st.session_state:
     st.session_state.yearly_goals_completed = {}
@@ -28,8 +14,10 @@ if st.session_state.pop("_clear_new_goal_input_empty", None):
 
 st.title("🎯 Goals for the Year")
 
-if not st.session_state.yearly_goals_df.empty:
-    df = st.session_state.yearly_goals_df.copy()
+goals_df = goals_table.frame()
+
+if not goals_df.empty:
+    df = goals_df.copy()
     
     goal_col = None
     for col in df.columns:
@@ -43,8 +31,9 @@ if not st.session_state.yearly_goals_df.empty:
     if goal_col is None:
         st.error("No data found in the Google Sheet. Please add some goals.")
     else:
-        for idx, row in df.iterrows():
-            goal_key = f"goal_{idx}"
+        for _, row in df.iterrows():
+            row_id = row["row_id"]
+            goal_key = f"goal_{row_id}"
             goal_name = str(row.get(goal_col, '')).strip()
             
             if goal_name == '':
@@ -62,39 +51,36 @@ if not st.session_state.yearly_goals_df.empty:
                     st.session_state.yearly_goals_completed[goal_key] = checked
 
                 with col2:
-                    if st.button("✏️", key=f"edit_{idx}", help="Edit", use_container_width=True):
-                        st.session_state[f"editing_{idx}"] = True
+                    if st.button("✏️", key=f"edit_{row_id}", help="Edit", use_container_width=True):
+                        st.session_state[f"editing_{row_id}"] = True
                 
                 with col3:
-                    if st.button("🗑️", key=f"delete_{idx}", help="Delete", use_container_width=True):
+                    if st.button("🗑️", key=f"delete_{row_id}", help="Delete", use_container_width=True):
                         try:
-                            ws.delete_rows(idx + 2)
+                            goals_table.delete_by_id(row_id)
                             st.success(f"Deleted '{goal_name}' from goals!")
-                            st.session_state.yearly_goals_df = pd.DataFrame(ws.get_all_records())
                             st.rerun()
                         except Exception as e:
                             st.error(f"Error deleting goal: {str(e)}")
                 
-                if st.session_state.get(f"editing_{idx}", False):
+                if st.session_state.get(f"editing_{row_id}", False):
                     with st.expander(f"Edit: {goal_name}", expanded=True):
-                        edit_goal = st.text_input("Goal", value=goal_name, key=f"edit_goal_{idx}")
+                        edit_goal = st.text_input("Goal", value=goal_name, key=f"edit_goal_{row_id}")
                         
                         edit_save_col, edit_cancel_col = st.columns([1, 1])
                         with edit_save_col:
-                            if st.button("☁️ Save Changes", key=f"save_edit_{idx}"):
+                            if st.button("☁️ Save Changes", key=f"save_edit_{row_id}"):
                                 try:
-                                    ws.update(values=[[edit_goal]], 
-                                             range_name=f"A{idx+2}")
+                                    goals_table.update_by_id(row_id, [edit_goal])
                                     st.success("Goal updated successfully!")
-                                    st.session_state[f"editing_{idx}"] = False
-                                    st.session_state.yearly_goals_df = pd.DataFrame(ws.get_all_records())
+                                    st.session_state[f"editing_{row_id}"] = False
                                     st.rerun()
                                 except Exception as e:
                                     st.error(f"Error updating goal: {str(e)}")
                         
                         with edit_cancel_col:
-                            if st.button("❌ Cancel", key=f"cancel_edit_{idx}"):
-                                st.session_state[f"editing_{idx}"] = False
+                            if st.button("❌ Cancel", key=f"cancel_edit_{row_id}"):
+                                st.session_state[f"editing_{row_id}"] = False
                                 st.rerun()
             else:
                 checked = st.checkbox(
@@ -121,15 +107,16 @@ if not st.session_state.yearly_goals_df.empty:
             if add_clicked:
                 if new_goal.strip():
                     try:
-                        ws.append_row([new_goal.strip()])
+                        goals_table.append_row([new_goal.strip()])
                         st.success(f"Added '{new_goal}' to your yearly goals!")
-                        st.session_state.yearly_goals_df = pd.DataFrame(ws.get_all_records())
                         st.session_state["_clear_new_goal_input"] = True
                         st.rerun()
                     except Exception as e:
                         st.error(f"Error adding goal: {str(e)}")
                 else:
                     st.error("Please enter a goal.")
+            
+            render_bulk_editor(goals_table, goal_col, "goals", label="Goal")
         
         total_items = len([row for _, row in df.iterrows() if str(row.get(goal_col, '')).strip()])
         checked_items = sum(st.session_state.yearly_goals_completed.values())
@@ -175,9 +162,8 @@ else:
         if add_clicked:
             if new_goal.strip():
                 try:
-                    ws.append_row([new_goal.strip()])
+                    goals_table.append_row([new_goal.strip()])
                     st.success(f"Added '{new_goal}' to your yearly goals!")
-                    st.session_state.yearly_goals_df = pd.DataFrame(ws.get_all_records())
                     st.session_state["_clear_new_goal_input_empty"] = True
                     st.rerun()
                 except Exception as e:
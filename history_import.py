@@ -0,0 +1,146 @@
+import os
+import pandas as pd
+import streamlit as st
+from schema import get_schema, row_dates
+from sleep_data import parse_datetimes, save_segments
+from table_cache import get_table
+from write_queue import MAX_APPEND_ROWS
+
+# Tables that accept history imports, with the columns that identify an already-logged entry.
+# A night can hold several sleep segments, so sleep rows are identified by their start.
+IMPORT_TABLES = {
+    "Fitness Activities": ("fitness_activities", ["date", "exercise"]),
+    "Sleep Schedule": ("sleep_schedule", ["sleep_start_datetime"]),
+    "Nutrition & Hydration": ("nutrition_and_hydration", ["date"]),
+}
+# Rows parsed per chunk while reading the uploaded file.
+READ_CHUNK_ROWS = 5000
+# Tables whose imported rows are merged through save_segments() instead of appended as is.
+SEGMENT_TABLES = {"sleep_schedule"}
+# Rows per append request; each batch is one queued write, paced by the Sheets quota limiter.
+# The queue never merges appends past this size, so the chunks reach Sheets as sent.
+APPEND_BATCH_ROWS = MAX_APPEND_ROWS
+
+
+def read_chunks(uploaded_file):
+    """Yield the uploaded CSV/XLSX as text-only DataFrame chunks."""
+    if os.path.splitext(uploaded_file.name)[1].lower() == ".xlsx":
+        df = pd.read_excel(uploaded_file, dtype=str).fillna("")
+        for start in range(0, len(df), READ_CHUNK_ROWS):
+            yield df.iloc[start:start + READ_CHUNK_ROWS]
+    else:
+        yield from pd.read_csv(uploaded_file, dtype=str, keep_default_na=False, chunksize=READ_CHUNK_ROWS)
+
+
+def normalize_chunk(schema, raw):
+    """Map a chunk onto the table's columns in the format the log forms write.
+
+    Returns (rows, invalid): rows carry a helper "_date" column; invalid counts rows
+    dropped because a date or datetime column could not be parsed.
+    """
+    raw = raw.rename(columns=schema.resolve(raw.columns))
+    out = pd.DataFrame(index=raw.index)
+    valid = pd.Series(True, index=raw.index)
+    # Dates and datetimes are read exactly as the rest of the app reads them (slashes are day-first);
+    # time-only values need a date column in the file.
+    days = parse_datetimes(raw["date"]) if "date" in raw.columns else pd.Series(pd.NaT, index=raw.index)
+    for col in schema.columns:
+        values = raw[col].astype(str).str.strip() if col in raw.columns else pd.Series("", index=raw.index)
+        kind = schema.types[col]
+        if kind == "date" or col.endswith("_datetime"):
+            parsed = parse_datetimes(values, date_series=days)
+            valid &= parsed.notna()
+            out[col] = parsed.dt.strftime("%Y-%m-%d" if kind == "date" else "%Y-%m-%d %H:%M")
+            if col == schema.date_column:
+                out["_date"] = parsed.dt.normalize()
+        elif kind == "float32":
+            numbers = pd.to_numeric(values.str.replace(",", "", regex=False), errors="coerce")
+            out[col] = numbers.astype(object).where(numbers.notna(), "")
+        else:
+            out[col] = values
+    return out[valid], int((~valid).sum())
+
+
+def dedupe_keys(rows, key_columns):
+    """Comparable key per row: its date plus any other identifying columns, case-insensitive."""
+    keys = rows["_date"].dt.strftime("%Y-%m-%d")
+    for col in key_columns:
+        if col.endswith("_datetime"):
+            # Logged datetimes may be in older layouts; compare them in the format imports write.
+            keys = keys + "|" + parse_datetimes(rows[col]).dt.strftime("%Y-%m-%d %H:%M").fillna("")
+        elif col != "date":
+            keys = keys + "|" + rows[col].astype(str).str.strip().str.lower()
+    return keys
+
+
+def prepare_import(table_name, key_columns, uploaded_file):
+    """Parse, validate and de-duplicate an upload; returns (new rows, invalid count, duplicate count)."""
+    schema = get_schema(table_name)
+    frames, invalid = [], 0
+    for chunk in read_chunks(uploaded_file):
+        rows, dropped = normalize_chunk(schema, chunk)
+        frames.append(rows)
+        invalid += dropped
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=schema.columns + ["_date"])
+    if rows.empty:
+        return rows, invalid, 0
+
+    keys = dedupe_keys(rows, key_columns)
+    existing = get_table(table_name).read_range(rows["_date"].min().date(), rows["_date"].max().date())
+    seen = set()
+    if not existing.empty:
+        existing = existing.assign(_date=row_dates(table_name, existing)).dropna(subset=["_date"])
+        seen = set(dedupe_keys(existing, key_columns))
+    keep = ~keys.isin(seen) & ~keys.duplicated()
+    return rows[keep].sort_values("_date", kind="stable").reset_index(drop=True), invalid, int((~keep).sum())
+
+
+st.title("📥 Import History")
+st.caption("Bring past logs in from a spreadsheet. Column names are matched to the log's fields; "
+           "entries already logged are skipped, and sleep segments that overlap logged ones are merged.")
+
+table_label = st.selectbox("Import into", list(IMPORT_TABLES))
+table_name, key_columns = IMPORT_TABLES[table_label]
+st.caption("Expected columns: " + ", ".join(get_schema(table_name).columns))
+
+uploaded_file = st.file_uploader("CSV or Excel file", type=["csv", "xlsx"])
+
+if uploaded_file is not None:
+    prepared_key = (table_name, uploaded_file.file_id)
+    if st.session_state.get("import_prepared_key") != prepared_key:
+        try:
+            with st.spinner("Checking file..."):
+                st.session_state["import_prepared"] = prepare_import(table_name, key_columns, uploaded_file)
+            st.session_state["import_prepared_key"] = prepared_key
+        except Exception as e:
+            st.error(f"Could not read file: {str(e)}")
+            st.stop()
+
+    rows, invalid, duplicates = st.session_state["import_prepared"]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("New entries", len(rows))
+    col2.metric("Already logged", duplicates)
+    col3.metric("Unreadable", invalid, help="Rows whose date or time could not be parsed")
+
+    if rows.empty:
+        st.info("Nothing new to import.")
+    else:
+        first, last = rows["_date"].iloc[0].date(), rows["_date"].iloc[-1].date()
+        st.caption(f"Entries from {first} to {last}")
+        st.dataframe(rows.drop(columns=["_date"]).head(100), width="stretch", hide_index=True)
+
+        if st.button(f"☁️ Import {len(rows)} entries"):
+            table = get_table(table_name)
+            values = rows.drop(columns=["_date"]).values.tolist()
+            progress = st.progress(0.0)
+            try:
+                for start in range(0, len(values), APPEND_BATCH_ROWS):
+                    if table_name in SEGMENT_TABLES:
+                        save_segments(table, [row[:2] for row in values[start:start + APPEND_BATCH_ROWS]])
+                    else:
+                        table.append_rows(values[start:start + APPEND_BATCH_ROWS])
+                    progress.progress(min(start + APPEND_BATCH_ROWS, len(values)) / len(values))
+                st.session_state.pop("import_prepared_key", None)
+                st.success(f"Imported {len(values)} entries into {table_label}.")
+            except Exception as e:
+                st.error(f"Import stopped after {start} entries: {str(e)}")
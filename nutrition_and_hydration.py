@@ -1,23 +1,9 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from table_cache import get_table
 from datetime import date
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-ws = client.open("nutrition_and_hydration").sheet1
-
-if "nutrition_df" not in st.session_state:
-    st.session_state.nutrition_df = pd.DataFrame(ws.get_all_records())
+nutrition_table = get_table("nutrition_and_hydration")
 
 st.title("🍎 Nutrition & Hydration")
 
@@ -25,37 +11,16 @@ today = date.today()
 
 entry_date = st.date_input("Date", today)
 
-df_records = st.session_state.nutrition_df.to_dict(orient="records")
-existing_row_idx, existing_row = None, None
-for i, row in enumerate(df_records):
-    if str(row.get("date")) == str(entry_date):
-        existing_row_idx = i + 2
-        existing_row = row
-        break
-
+existing_row = nutrition_table.find(entry_date)
+existing_row = existing_row or {}
+existing_row_id = existing_row.get("row_id")
 
-def resolve_col(record_keys, candidates):
-    for c in candidates:
-        if c in record_keys:
-            return c
-    for k in record_keys:
-        kl = k.lower()
-        if any(c in kl for c in candidates):
-            return k
-    return None
-
-def prefill_value(record, candidates, default_val):
-    if not record:
-        return default_val
-    col = resolve_col(record.keys(), candidates)
-    return record.get(col, default_val) if col else default_val
-
-prefill_breakfast = str(prefill_value(existing_row, ["breakfast"], ""))
-prefill_lunch = str(prefill_value(existing_row, ["lunch"], ""))
-prefill_dinner = str(prefill_value(existing_row, ["dinner"], ""))
-prefill_snacks = str(prefill_value(existing_row, ["snacks", "snack"], ""))
-prefill_supplements = str(prefill_value(existing_row, ["supplements", "supplement"], ""))
-prefill_water = prefill_value(existing_row, ["water_ml", "water"], 0)
+prefill_breakfast = str(existing_row.get("breakfast", ""))
+prefill_lunch = str(existing_row.get("lunch", ""))
+prefill_dinner = str(existing_row.get("dinner", ""))
+prefill_snacks = str(existing_row.get("snacks", ""))
+prefill_supplements = str(existing_row.get("supplements", ""))
+prefill_water = existing_row.get("water_ml", 0)
 try:
     prefill_water = int(prefill_water) if str(prefill_water).strip() != "" else 0
 except (ValueError, TypeError):
@@ -79,46 +44,28 @@ col_save, col_delete = st.columns([1, 1])
 with col_save:
     save_clicked = st.button("☁️ Save")
 with col_delete:
-    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_idx is None))
+    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_id is None))
 
 if save_clicked:
     try:
-        if existing_row_idx:
-            ws.update(values=[[breakfast, lunch, dinner, snacks, supplements, int(water_ml)]], range_name=f"B{existing_row_idx}:G{existing_row_idx}")
+        if existing_row_id is not None:
+            nutrition_table.update_by_id(existing_row_id, [breakfast, lunch, dinner, snacks, supplements, int(water_ml)], start_col=2)
             st.success(f"Updated nutrition log for {entry_date}.")
         else:
-            ws.append_row([str(entry_date), breakfast, lunch, dinner, snacks, supplements, int(water_ml)])
+            nutrition_table.append_row([str(entry_date), breakfast, lunch, dinner, snacks, supplements, int(water_ml)])
             st.success(f"Added new nutrition log for {entry_date}.")
-        st.session_state.nutrition_df = pd.DataFrame(ws.get_all_records())
     except Exception as e:
         st.error(f"Error saving data: {str(e)}")
 
-if delete_clicked and existing_row_idx:
+if delete_clicked and existing_row_id is not None:
     try:
-        ws.delete_rows(existing_row_idx)
+        nutrition_table.delete_by_id(existing_row_id)
         st.success(f"Deleted nutrition log for {entry_date}.")
-        st.session_state.nutrition_df = pd.DataFrame(ws.get_all_records())
     except Exception as e:
         st.error(f"Error deleting data: {str(e)}")
 
-if not st.session_state.nutrition_df.empty:
-    df = st.session_state.nutrition_df.copy()
-    df["date"] = pd.to_datetime(df["date"])
-
-    valid_dates = df["date"].dropna()
-    if valid_dates.empty:
-        st.warning("No valid dates found in the data.")
-        st.stop()
-
-    min_date = valid_dates.min().date()
-    max_date = valid_dates.max().date()
-    today_val = date.today()
-    try:
-        _ = min_date.year  # sanity
-    except Exception:
-        min_date = today_val
-        max_date = today_val
-
+min_date, max_date = nutrition_table.date_bounds()
+if min_date is not None:
     st.write("")
     st.write("")
     header_col, filter_col1, filter_col2 = st.columns([2, 1, 1])
@@ -134,11 +81,11 @@ if not st.session_state.nutrition_df.empty:
         st.warning("Invalid date range: the start date cannot be after the end date.")
         filtered_df = pd.DataFrame()
     else:
-        filtered_df = df[(df["date"].dt.date >= start_filter) & (df["date"].dt.date <= end_filter)].copy()
+        filtered_df = nutrition_table.read_range(start_filter, end_filter).copy()
 
     if not filtered_df.empty:
         # Interactive table
-        df_display = filtered_df.rename(columns={
+        df_display = filtered_df.drop(columns=["row_id"], errors="ignore").rename(columns={
             "date": "Date",
             "breakfast": "Breakfast",
             "lunch": "Lunch",
@@ -147,16 +94,7 @@ if not st.session_state.nutrition_df.empty:
             "supplements": "Supplements",
             "water_ml": "Water (ml)"
         })
-
-        # Normalize display if original columns are differently named
-        for alt, std in [
-            ("water", "Water (ml)"),
-            ("supplement", "Supplements")
-        ]:
-            if alt in df_display.columns and std not in df_display.columns:
-                df_display = df_display.rename(columns={alt: std})
-
-        df_display["Date"] = pd.to_datetime(df_display["Date"]).dt.date
+        df_display["Date"] = df_display["Date"].dt.date
         with st.expander("Log entries", expanded=False):
             st.dataframe(df_display.sort_values("Date", ascending=False), width="stretch")
     else:
@@ -1,23 +1,9 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from table_cache import get_table
 from datetime import date
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-ws = client.open("professional_development_and_personal_growth").sheet1
-
-if "growth_df" not in st.session_state:
-    st.session_state.growth_df = pd.DataFrame(ws.get_all_records())
+growth_table = get_table("professional_development_and_personal_growth")
 
 st.title("📚 Professional & Personal Development")
 
@@ -26,39 +12,12 @@ today = date.today()
 entry_date = st.date_input("Date", today)
 
 # Find existing record
-df_records = st.session_state.growth_df.to_dict(orient="records")
-existing_row_idx, existing_row = None, None
-for i, row in enumerate(df_records):
-    if str(row.get("date")) == str(entry_date):
-        existing_row_idx = i + 2  # account for header row
-        existing_row = row
-        break
-
-# Prefill values
-def find_cols(record: dict):
-    prof_key = None
-    pers_key = None
-    for col in record.keys():
-        cl = col.lower()
-        if prof_key is None and ("professional" in cl or "dev" in cl):
-            prof_key = col
-        if pers_key is None and ("personal" in cl or "growth" in cl):
-            pers_key = col
-    # Fallback order-based if not found
-    keys = list(record.keys())
-    if prof_key is None and len(keys) > 1:
-        prof_key = keys[1]
-    if pers_key is None and len(keys) > 2:
-        pers_key = keys[2]
-    return prof_key, pers_key
+existing_row = growth_table.find(entry_date)
 
-if existing_row:
-    prof_col, pers_col = find_cols(existing_row)
-    prefill_prof = str(existing_row.get(prof_col, "")) if prof_col else ""
-    prefill_pers = str(existing_row.get(pers_col, "")) if pers_col else ""
-else:
-    prefill_prof = ""
-    prefill_pers = ""
+existing_row = existing_row or {}
+existing_row_id = existing_row.get("row_id")
+prefill_prof = str(existing_row.get("professional_development", ""))
+prefill_pers = str(existing_row.get("personal_growth", ""))
 
 col1, col2 = st.columns(2)
 with col1:
@@ -78,48 +37,32 @@ col_save, col_delete = st.columns([1, 1])
 with col_save:
     save_clicked = st.button("☁️ Save")
 with col_delete:
-    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_idx is None))
+    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_id is None))
 
 if save_clicked:
     try:
-        if existing_row_idx:
-            ws.update(
-                values=[[professional_development, personal_growth]],
-                range_name=f"B{existing_row_idx}:C{existing_row_idx}",
+        if existing_row_id is not None:
+            growth_table.update_by_id(
+                existing_row_id,
+                [professional_development, personal_growth],
+                start_col=2,
             )
             st.success(f"Updated growth log for {entry_date}.")
         else:
-            ws.append_row([str(entry_date), professional_development, personal_growth])
+            growth_table.append_row([str(entry_date), professional_development, personal_growth])
             st.success(f"Added new growth log for {entry_date}.")
-        st.session_state.growth_df = pd.DataFrame(ws.get_all_records())
     except Exception as e:
         st.error(f"Error saving data: {str(e)}")
 
-if delete_clicked and existing_row_idx:
+if delete_clicked and existing_row_id is not None:
     try:
-        ws.delete_rows(existing_row_idx)
+        growth_table.delete_by_id(existing_row_id)
         st.success(f"Deleted growth log for {entry_date}.")
-        st.session_state.growth_df = pd.DataFrame(ws.get_all_records())
     except Exception as e:
         st.error(f"Error deleting data: {str(e)}")
 
-if not st.session_state.growth_df.empty:
-    df = st.session_state.growth_df.copy()
-    df["date"] = pd.to_datetime(df["date"])
-
-    valid_dates = df["date"].dropna()
-    if valid_dates.empty:
-        st.warning("No valid dates found in the data.")
-        st.stop()
-
-    min_date = valid_dates.min().date()
-    max_date = valid_dates.max().date()
-
-    today_val = date.today()
-    if pd.isna(min_date) or pd.isna(max_date):
-        min_date = today_val
-        max_date = today_val
-
+min_date, max_date = growth_table.date_bounds()
+if min_date is not None:
     st.write("")
     st.write("")
     header_col, filter_col1, filter_col2 = st.columns([2, 1, 1])
@@ -135,39 +78,17 @@ if not st.session_state.growth_df.empty:
         st.warning("Invalid date range: the start date cannot be after the end date.")
         filtered_df = pd.DataFrame()
     else:
-        filtered_df = df[(df["date"].dt.date >= start_filter) & (df["date"].dt.date <= end_filter)].copy()
+        filtered_df = growth_table.read_range(start_filter, end_filter).copy()
 
     if not filtered_df.empty:
         # Interactive Table
-        df_display = filtered_df.rename(columns={
+        df_display = filtered_df.drop(columns=["row_id"], errors="ignore").rename(columns={
             "date": "Date",
+            "professional_development": "Professional Development",
+            "personal_growth": "Personal Growth",
         })
 
-        def resolve_col(cols, candidates):
-            for c in candidates:
-                if c in cols:
-                    return c
-            for col in cols:
-                cl = col.lower()
-                if any(k in cl for k in candidates):
-                    return col
-            return None
-
-        prof_candidates = ["professional_development", "professional", "development"]
-        pers_candidates = ["personal_growth", "personal", "growth"]
-
-        prof_col = resolve_col(filtered_df.columns, prof_candidates)
-        pers_col = resolve_col(filtered_df.columns, pers_candidates)
-
-        rename_map = {}
-        if prof_col:
-            rename_map[prof_col] = "Professional Development"
-        if pers_col:
-            rename_map[pers_col] = "Personal Growth"
-        if rename_map:
-            df_display = df_display.rename(columns=rename_map)
-
-        df_display["Date"] = pd.to_datetime(df_display["Date"]).dt.date
+        df_display["Date"] = df_display["Date"].dt.date
         with st.expander("Log entries", expanded=False):
             st.dataframe(df_display.sort_values("Date", ascending=False), width="stretch")
     else:
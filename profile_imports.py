@@ -0,0 +1,69 @@
+"""Report the cold-start import cost of each page.
+
+Usage: python profile_imports.py [page.py ...]   (default: every page registered in app.py)
+
+Each page's top-level imports run in a fresh interpreter under `python -X importtime`,
+so the numbers are what the first visit to that page pays in a new server process.
+"""
+import ast
+import subprocess
+import sys
+
+APP_PATH = "app.py"
+# Modules listed per page, by cumulative import time.
+TOP_MODULES = 8
+
+
+def app_pages(path=APP_PATH):
+    """Return the page scripts registered with create_pages() in app.py."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [node.value for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.endswith(".py")]
+
+
+def page_imports(path):
+    """Return the modules a page script imports at top level."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def import_times(modules):
+    """Import `modules` in a fresh interpreter; return [(cumulative_us, self_us, depth, name)]."""
+    code = "\n".join(f"import {m}" for m in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    if result.returncode:
+        print(result.stderr.strip().splitlines()[-1], file=sys.stderr)
+    return times
+
+
+def main(pages):
+    # Interpreter startup modules (site, encodings, ...) are paid by every process alike.
+    startup = {name for _, _, _, name in import_times([])}
+    baseline = sum(c for c, _, depth, name in import_times(["streamlit"]) if depth == 0 and name not in startup)
+    print(f"{'streamlit (shared baseline)':<45}{baseline / 1000:>9.0f} ms")
+    for page in pages:
+        times = import_times(["streamlit"] + page_imports(page))
+        top = sorted((t for t in times if t[2] == 0 and t[3] not in startup and t[3] != "streamlit"), reverse=True)
+        total = sum(c for c, _, _, _ in top)
+        print(f"{page:<45}{total / 1000:>9.0f} ms")
+        for cumulative_us, _, _, name in top[:TOP_MODULES]:
+            print(f"    {name:<41}{cumulative_us / 1000:>9.0f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or app_pages())
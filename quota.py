@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+import requests
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+# Per-minute request budgets of the service account (Sheets default user quotas; Drive is far higher).
+QUOTAS_PER_MINUTE = {"read": 60, "write": 60, "drive": 1000}
+# Retries of a throttled or failed request before the error is raised to the page.
+MAX_RETRIES = 6
+# Backoff ceiling in seconds; each retry sleeps a random time up to min(MAX_BACKOFF, 2 ** attempt).
+MAX_BACKOFF = 64
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_local = threading.local()
+
+
+@contextmanager
+def single_attempt():
+    """Send Sheets requests made in this block once, without retrying; for writes that are unsafe to repeat blindly."""
+    previous = getattr(_local, "retries", MAX_RETRIES)
+    _local.retries = 0
+    try:
+        yield
+    finally:
+        _local.retries = previous
+
+
+@contextmanager
+def background():
+    """Run Sheets requests made in this block at background priority."""
+    previous = getattr(_local, "priority", INTERACTIVE)
+    _local.priority = BACKGROUND
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to one minute's quota; background callers wait while interactive ones are queued."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting = [0, 0]
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=INTERACTIVE):
+        """Block until a request may be sent."""
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    yielding = priority == BACKGROUND and self._waiting[INTERACTIVE] > 0
+                    if self.tokens >= 1 and not yielding:
+                        self.tokens -= 1
+                        return
+                    self._cond.wait(max((1 - self.tokens) / self.rate, 0.05))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def drain(self):
+        """Empty the bucket after the server reports the quota exhausted."""
+        with self._cond:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+
+_buckets = {kind: TokenBucket(limit) for kind, limit in QUOTAS_PER_MINUTE.items()}
+
+
+def quota_class(method, endpoint):
+    """Classify a request against the quota it consumes: "read", "write" or "drive"."""
+    if "/drive/" in endpoint:
+        return "drive"
+    return "read" if method.upper() == "GET" else "write"
+
+
+def status_code(err):
+    """HTTP status of a failed API request, from the response itself.
+
+    gspread sets APIError.code to -1 when the body isn't JSON (e.g. the HTML 502/503
+    pages served during outages), so the response status is the reliable source.
+    """
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status
+    code = getattr(err, "code", None)
+    return code if isinstance(code, int) and code > 0 else None
+
+
+def is_transient(err):
+    """Return True if a failed request is worth retrying later (throttling, timeouts, server or network errors)."""
+    if isinstance(err, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if not isinstance(err, APIError):
+        return False
+    status = status_code(err)
+    if status is None or status in (HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.REQUEST_TIMEOUT) \
+            or not HTTPStatus.BAD_REQUEST <= status < HTTPStatus.INTERNAL_SERVER_ERROR:
+        return True
+    # Drive reports rate limits as 403 with a usageLimits domain.
+    errors = err.error.get("errors") if isinstance(err.error, dict) else None
+    return status == HTTPStatus.FORBIDDEN and bool(errors) and errors[0].get("domain") == "usageLimits"
+
+
+def is_rejected(err):
+    """Return True if the API explicitly refused a request (a 4xx that retrying won't fix)."""
+    return isinstance(err, APIError) and not is_transient(err)
+
+
+class QuotaHTTPClient(HTTPClient):
+    """gspread HTTP client that paces requests per quota class and retries throttling with jittered backoff."""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        bucket = _buckets[quota_class(method, endpoint)]
+        priority = getattr(_local, "priority", INTERACTIVE)
+        retries = getattr(_local, "retries", MAX_RETRIES)
+        for attempt in range(retries + 1):
+            bucket.acquire(priority)
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except (APIError, requests.ConnectionError, requests.Timeout) as err:
+                if attempt == retries or not is_transient(err):
+                    raise
+                if status_code(err) == HTTPStatus.TOO_MANY_REQUESTS:
+                    bucket.drain()
+            time.sleep(random.uniform(0, min(MAX_BACKOFF, 2 ** attempt)))
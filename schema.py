@@ -0,0 +1,140 @@
+import threading
+import pandas as pd
+
+COLUMN_NAMES_PATH = "column_names.txt"
+# Column added to every table to identify rows independently of their position.
+ROW_ID_COLUMN = "row_id"
+
+# Column dtypes in typed frames; columns not listed stay as text.
+COLUMN_TYPES = {
+    "date": "date",
+    "exercise": "category",
+    "section": "category",
+    "sets": "float32",
+    "reps": "float32",
+    "weight_kg": "float32",
+    "duration_min": "float32",
+    "distance_km": "float32",
+    "water_ml": "float32",
+}
+
+# Header spellings accepted for a column, tried in order after an exact match:
+# first as whole (case-insensitive) names, then as substrings.
+COLUMN_HINTS = {
+    "sleep_start_datetime": ["sleep_start", "start", "sleep"],
+    "sleep_end_datetime": ["sleep_end", "end", "wake"],
+    "snacks": ["snack"],
+    "supplements": ["supplement"],
+    "water_ml": ["water"],
+    "duration_min": ["duration_sec", "duration"],
+    "professional_development": ["professional", "dev"],
+    "personal_growth": ["personal", "growth"],
+    "image_data": ["image", "picture", "photo", "file_id"],
+}
+
+
+def load_table_columns(path=COLUMN_NAMES_PATH):
+    """Parse column_names.txt into {table_name: [column, ...]}."""
+    tables = {}
+    current = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if line.endswith(":") and "\t" not in line:
+                current = line[:-1].strip()
+                tables[current] = []
+            elif current is not None:
+                tables[current] = [c.strip() for c in line.split("\t") if c.strip()]
+    return tables
+
+
+class TableSchema:
+    """Canonical columns and dtypes of one table."""
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = list(columns)
+        self.types = {col: COLUMN_TYPES.get(col, "text") for col in self.columns}
+
+    @property
+    def date_column(self):
+        """Column holding each row's date, or None for list-style tables."""
+        if "date" in self.columns:
+            return "date"
+        return next((c for c in self.columns if c.endswith("_datetime")), None)
+
+    def resolve(self, actual_columns):
+        """Map the sheet's header to canonical names: {actual: canonical}."""
+        actual = [str(c) for c in actual_columns if str(c) != ROW_ID_COLUMN]
+        mapping = {}
+        claimed = set()
+        for canonical in self.columns:
+            match = canonical if canonical in actual else None
+            hints = COLUMN_HINTS.get(canonical, [])
+            if match is None:
+                match = next((a for h in hints for a in actual
+                              if a not in claimed and a.lower() == h), None)
+            if match is None:
+                match = next((a for h in hints for a in actual
+                              if a not in claimed and a not in self.columns and h in a.lower()), None)
+            if match is not None and match not in claimed:
+                mapping[match] = canonical
+                claimed.add(match)
+        for position, canonical in enumerate(self.columns):
+            if canonical not in mapping.values() and position < len(actual) and actual[position] not in claimed:
+                mapping[actual[position]] = canonical
+                claimed.add(actual[position])
+        return mapping
+
+    def coerce(self, df):
+        """Return a copy of `df` with canonical column names and schema dtypes (the row ID column is kept as is)."""
+        typed = df.rename(columns=self.resolve(df.columns))
+        for col in self.columns:
+            if col not in typed.columns:
+                typed[col] = pd.Series(index=typed.index, dtype=object)
+            kind = self.types[col]
+            if kind == "date":
+                from sleep_data import parse_datetimes  # sleep_data imports this module
+                typed[col] = parse_datetimes(typed[col]).dt.normalize()
+            elif kind == "float32":
+                typed[col] = pd.to_numeric(typed[col], errors="coerce").astype("float32")
+            elif kind == "category":
+                typed[col] = typed[col].astype("string").str.strip().astype("category")
+        return typed
+
+
+def row_dates(name, typed):
+    """Date of each row of a typed frame: its date column, or the date part of the table's datetime column."""
+    schema = get_schema(name)
+    dates = pd.Series(pd.NaT, index=typed.index, dtype="datetime64[ns]")
+    if "date" in typed.columns:
+        dates = pd.to_datetime(typed["date"], errors="coerce")
+    col = schema.date_column if schema else None
+    if col and col != "date" and col in typed.columns:
+        from sleep_data import parse_datetimes  # sleep_data imports this module
+        # Time-only values take the row's date column; without one they stay NaT rather than today.
+        days = typed["date"] if "date" in typed.columns else pd.Series(pd.NaT, index=typed.index)
+        dates = dates.fillna(parse_datetimes(typed[col], date_series=days))
+    return dates.dt.normalize()
+
+
+_schemas = None
+_schemas_lock = threading.Lock()
+
+
+def get_schema(name):
+    """Return the schema for a table (seeded from column_names.txt), or None if unknown."""
+    global _schemas
+    if _schemas is None:
+        with _schemas_lock:
+            if _schemas is None:
+                _schemas = {table: TableSchema(table, cols) for table, cols in load_table_columns().items()}
+    return _schemas.get(name)
+
+
+def table_names():
+    """Return every table name known to the schema registry."""
+    get_schema("")
+    return list(_schemas)
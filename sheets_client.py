@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import gspread
+import streamlit as st
+from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+from quota import QuotaHTTPClient
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Connections kept alive per host; sized for many concurrent Streamlit sessions.
+POOL_SIZE = 32
+
+SPREADSHEET_IDS_PATH = os.path.join("data", "spreadsheet_ids.json")
+
+
+class SheetsClient:
+    def __init__(self):
+        self.client = None
+        self._lock = threading.Lock()
+        self._keys = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+
+    def _get_client(self):
+        """Return the shared gspread client, authorizing it once per server process."""
+        if self.client is None:
+            with self._lock:
+                if self.client is None:
+                    creds = Credentials.from_service_account_info(
+                        st.secrets["gcp_service_account"],
+                        scopes=SCOPES
+                    )
+                    client = gspread.authorize(creds, http_client=QuotaHTTPClient)
+                    # AuthorizedSession refreshes the token itself; a larger pool
+                    # lets concurrent sessions reuse open TLS connections.
+                    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                    client.http_client.session.mount("https://", adapter)
+                    self.client = client
+        return self.client
+
+    def _get_keys(self):
+        """Return the table name -> spreadsheet key registry, loading it on first use."""
+        if self._keys is None:
+            keys = {}
+            try:
+                with open(SPREADSHEET_IDS_PATH, encoding="utf-8") as f:
+                    keys.update(json.load(f))
+            except (FileNotFoundError, OSError, ValueError):
+                pass
+            try:
+                keys.update(dict(st.secrets.get("spreadsheet_ids", {})))
+            except Exception:
+                pass
+            self._keys = keys
+        return self._keys
+
+    def _save_keys(self):
+        try:
+            os.makedirs(os.path.dirname(SPREADSHEET_IDS_PATH), exist_ok=True)
+            with open(SPREADSHEET_IDS_PATH, "w", encoding="utf-8") as f:
+                json.dump(self._keys, f, indent=2, sort_keys=True)
+        except OSError:
+            pass
+
+    def spreadsheet_key(self, name):
+        """Resolve a table name to its spreadsheet key, searching Drive by title only once."""
+        with self._lock:
+            key = self._get_keys().get(name)
+        if key:
+            return key
+        spreadsheet = self._get_client().open(name)
+        with self._lock:
+            self._keys[name] = spreadsheet.id
+            self._spreadsheets[name] = spreadsheet
+            self._save_keys()
+        return spreadsheet.id
+
+    def spreadsheet(self, name):
+        """Return the cached Spreadsheet handle for a table name."""
+        spreadsheet = self._spreadsheets.get(name)
+        if spreadsheet is not None:
+            return spreadsheet
+        key = self.spreadsheet_key(name)
+        try:
+            spreadsheet = self._get_client().open_by_key(key)
+        except gspread.SpreadsheetNotFound:
+            # Stale registry entry (sheet recreated); resolve by title again.
+            self.forget(name)
+            spreadsheet = self._get_client().open(name)
+            with self._lock:
+                self._keys[name] = spreadsheet.id
+                self._save_keys()
+        with self._lock:
+            self._spreadsheets[name] = spreadsheet
+        return spreadsheet
+
+    def worksheet(self, name):
+        """Return the cached first worksheet of a table's spreadsheet."""
+        ws = self._worksheets.get(name)
+        if ws is None:
+            ws = self.spreadsheet(name).sheet1
+            with self._lock:
+                self._worksheets[name] = ws
+        return ws
+
+    def forget(self, name):
+        """Drop cached handles and the registry entry for a table name."""
+        with self._lock:
+            self._spreadsheets.pop(name, None)
+            self._worksheets.pop(name, None)
+            if self._get_keys().pop(name, None) is not None:
+                self._save_keys()
+
+    def open(self, title):
+        """Open a spreadsheet by title using the shared client."""
+        return self._get_client().open(title)
+
+    def create(self, title):
+        """Create a spreadsheet and register its key under the title."""
+        spreadsheet = self._get_client().create(title)
+        with self._lock:
+            self._get_keys()[title] = spreadsheet.id
+            self._spreadsheets[title] = spreadsheet
+            self._save_keys()
+        return spreadsheet
+
+
+sheets_client = SheetsClient()
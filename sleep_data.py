@@ -0,0 +1,275 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import streamlit as st
+from schema import ROW_ID_COLUMN
+
+# Layouts of stored sleep datetimes, tried in order; each is matched with a regex and parsed in one call.
+DATETIME_FORMATS = [
+    (r"\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{1,2}", "%Y-%m-%d %H:%M"),
+    (r"\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{1,2}:\d{1,2}", "%Y-%m-%d %H:%M:%S"),
+    (r"\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{1,2}", "%d/%m/%Y %H:%M"),
+    (r"\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{1,2}", "%m/%d/%Y %H:%M"),
+    (r"\d{4}-\d{1,2}-\d{1,2}", "%Y-%m-%d"),
+    (r"\d{1,2}/\d{1,2}/\d{4}", "%d/%m/%Y"),
+]
+# Time-only layouts of older logs; the date comes from the row's date column or `default_date`.
+TIME_FORMATS = [
+    (r"\d{1,2}:\d{1,2}", "%H:%M"),
+    (r"\d{1,2}:\d{1,2}:\d{1,2}", "%H:%M:%S"),
+]
+# A night runs from noon to noon, so a 00:30 bedtime or an afternoon nap belongs to the date the span starts on.
+NIGHT_OFFSET = pd.Timedelta(hours=12)
+
+
+def parse_datetimes(series, default_date=None, date_series=None):
+    """Parse datetime or time-only strings to a datetime64 Series aligned with `series` (NaT where unparseable).
+
+    Time-only values are placed on the matching row of `date_series` if given, else on `default_date`.
+    """
+    text = series.astype("string").str.strip().str[:19].str.replace("T", " ", n=1, regex=False)
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+
+    for pattern, fmt in DATETIME_FORMATS:
+        todo = parsed.isna() & text.str.fullmatch(pattern).fillna(False)
+        if todo.any():
+            parsed[todo] = pd.to_datetime(text[todo], format=fmt, errors="coerce")
+
+    for pattern, fmt in TIME_FORMATS:
+        todo = parsed.isna() & text.str.fullmatch(pattern).fillna(False)
+        if not todo.any():
+            continue
+        if date_series is not None:
+            days = pd.to_datetime(pd.Series(date_series.to_numpy(), index=series.index), errors="coerce").dt.normalize()
+        else:
+            days = pd.Series(pd.Timestamp(default_date or date.today()), index=series.index)
+        offsets = pd.to_datetime(text[todo], format=fmt, errors="coerce") - pd.Timestamp(1900, 1, 1)
+        parsed[todo] = days[todo] + offsets
+    return parsed
+
+
+def clean_sleep_data(df, sleep_start_col, sleep_end_col):
+    """Clean and parse sleep data from the dataframe."""
+    try:
+        # Clean the data first - remove any empty or invalid values
+        df_clean = df.dropna(subset=[sleep_start_col, sleep_end_col])
+        df_clean = df_clean[df_clean[sleep_start_col].astype(str).str.strip() != '']
+        df_clean = df_clean[df_clean[sleep_end_col].astype(str).str.strip() != '']
+
+        if df_clean.empty:
+            return None
+
+        # If sheet has a date column (old format), use it when parsing time-only
+        date_series = None
+        if "date" in df_clean.columns:
+            df_clean["date"] = pd.to_datetime(df_clean["date"])
+            date_series = df_clean["date"]
+
+        # Parse datetime values (support both datetime and time-only for backward compat)
+        df_clean["sleep_start_datetime"] = parse_datetimes(df_clean[sleep_start_col], date_series=date_series)
+        df_clean["sleep_end_datetime"] = parse_datetimes(df_clean[sleep_end_col], date_series=date_series)
+
+        # Remove rows where parsing failed
+        df_clean = df_clean.dropna(subset=["sleep_start_datetime", "sleep_end_datetime"])
+        # Derive the night (noon to noon) from sleep_start for filtering/charts, so naps group with their night
+        df_clean["date"] = (df_clean["sleep_start_datetime"] - NIGHT_OFFSET).dt.normalize()
+
+        return df_clean if not df_clean.empty else None
+
+    except Exception as e:
+        st.error(f"Error parsing datetime data: {str(e)}")
+        return None
+
+
+def night_segments(table, night):
+    """Sleep periods of one night (noon to noon from `night`), parsed and ordered by start.
+
+    Uses the table's date index, so only the rows dated `night` or the next day are parsed.
+    """
+    rows = table.read_range(night, night + timedelta(days=1))
+    if rows.empty:
+        return rows
+    rows = rows.assign(
+        sleep_start_datetime=parse_datetimes(rows["sleep_start_datetime"]),
+        sleep_end_datetime=parse_datetimes(rows["sleep_end_datetime"]),
+    )
+    noon = pd.Timestamp(night) + NIGHT_OFFSET
+    in_night = (rows["sleep_start_datetime"] >= noon) & (rows["sleep_start_datetime"] < noon + pd.Timedelta(days=1))
+    return rows[in_night & rows["sleep_end_datetime"].notna()].sort_values("sleep_start_datetime").reset_index(drop=True)
+
+
+class SleepIntervals:
+    """Sleep segments of a typed table sorted by start, for O(log n) overlap lookups.
+
+    Built once from the table, then kept in step with it by add() and remove() as
+    segments are saved; `frame` is the cached table snapshot it matches.
+    """
+
+    def __init__(self, typed, frame=None):
+        start = parse_datetimes(typed["sleep_start_datetime"]) if not typed.empty else pd.Series(dtype="datetime64[ns]")
+        end = parse_datetimes(typed["sleep_end_datetime"]) if not typed.empty else pd.Series(dtype="datetime64[ns]")
+        end = end.where(end > start, end + pd.Timedelta(days=1))
+        valid = (start.notna() & end.notna()).to_numpy()
+        order = np.argsort(start.to_numpy()[valid], kind="stable")
+        self.starts = list(pd.DatetimeIndex(start[valid].iloc[order]))
+        self.ends = list(pd.DatetimeIndex(end[valid].iloc[order]))
+        self.row_ids = list(typed[ROW_ID_COLUMN].to_numpy()[valid][order]) if not typed.empty else []
+        self._start_of = dict(zip(self.row_ids, self.starts))
+        # True while no segment overlaps the next one, so ends are sorted too; cleared (until the next
+        # rebuild) by an add() that overlaps a neighbour.
+        self.disjoint = all(e <= s for e, s in zip(self.ends, self.starts[1:]))
+        self.frame = frame
+
+    def overlapping(self, start, end):
+        """Positions of segments that overlap or touch [start, end], in start order."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        hi = bisect_right(self.starts, end)
+        if self.disjoint:
+            # Disjoint segments sorted by start have sorted ends too, so both bounds are binary searches.
+            lo = bisect_left(self.ends, start)
+            return range(lo, max(lo, hi))
+        return [p for p in range(hi) if self.ends[p] >= start]
+
+    def segment(self, position):
+        """(row ID, start, end) of the segment at a sorted position."""
+        return self.row_ids[position], self.starts[position], self.ends[position]
+
+    def add(self, row_id, start, end):
+        """Insert a saved segment at its sorted position."""
+        p = bisect_right(self.starts, start)
+        if (p and self.ends[p - 1] > start) or (p < len(self.starts) and end > self.starts[p]):
+            self.disjoint = False
+        self.starts.insert(p, start)
+        self.ends.insert(p, end)
+        self.row_ids.insert(p, row_id)
+        self._start_of[row_id] = start
+
+    def remove(self, row_id):
+        """Drop the segment with `row_id`, if there is one."""
+        start = self._start_of.pop(row_id, None)
+        if start is None:
+            return
+        p = bisect_left(self.starts, start)
+        while self.row_ids[p] != row_id:
+            p += 1
+        del self.starts[p], self.ends[p], self.row_ids[p]
+
+
+_intervals = {}
+_intervals_lock = threading.Lock()
+
+
+def get_intervals(table):
+    """Return the table's SleepIntervals, rebuilt only when the table changed other than through save_segments()."""
+    frame = table.frame()
+    with _intervals_lock:
+        cached = _intervals.get(table.name)
+    if cached is None or cached.frame is not frame:
+        cached = SleepIntervals(table.typed(), frame)
+        with _intervals_lock:
+            _intervals[table.name] = cached
+    return cached
+
+
+def _written(values):
+    """(start, end) of a segment as stored, i.e. at minute precision."""
+    return pd.Timestamp(values[0]), pd.Timestamp(values[1])
+
+
+def _synced(table, intervals, removed=(), added=()):
+    """Apply this module's own writes to `intervals` and mark it as matching the table again.
+
+    `added` holds (row ID, start, end); a None ID (not assigned locally) drops the intervals for a rebuild.
+    """
+    with _intervals_lock:
+        if _intervals.get(table.name) is not intervals:
+            return
+        if any(row_id is None for row_id, _, _ in added):
+            del _intervals[table.name]
+            return
+        for row_id in removed:
+            intervals.remove(row_id)
+        for row_id, start, end in added:
+            intervals.add(row_id, start, end)
+        intervals.frame = table.df
+
+
+def save_segments(table, segments, row_id=None):
+    """Save (start, end) sleep segments, merging them with each other and with every logged segment they overlap or touch.
+
+    `row_id` is the logged segment a single new one replaces when editing. Writes go
+    out as one batched update, append and delete. Returns the saved (start, end) spans
+    and the number of logged segments folded into them.
+    """
+    new = []
+    for start, end in segments:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        new.append((start, end if end > start else end + pd.Timedelta(days=1), None))
+    with table.locked():
+        return _save_segments(table, get_intervals(table), new, row_id)
+
+
+def _save_segments(table, intervals, new, row_id):
+
+    # Pull in logged segments until no merged span reaches another one.
+    logged, queries = {}, new
+    while queries:
+        found = [intervals.segment(p) for start, end, _ in queries for p in intervals.overlapping(start, end)]
+        found = [(left, right, rid) for rid, left, right in found if rid != row_id and rid not in logged]
+        logged.update((rid, (left, right, rid)) for left, right, rid in found)
+        queries = found
+
+    clusters = []
+    for start, end, rid in sorted(new + list(logged.values()), key=lambda seg: seg[0]):
+        if clusters and start <= clusters[-1][1]:
+            clusters[-1][1] = max(clusters[-1][1], end)
+            clusters[-1][2].append(rid)
+        else:
+            clusters.append([start, end, [rid]])
+
+    spans, updates, appends, extra, merged = [], {}, [], [], 0
+    for start, end, rids in clusters:
+        if None not in rids:
+            continue
+        old = [rid for rid in rids if rid is not None]
+        keep = row_id if row_id is not None else (old[0] if old else None)
+        values = [start.strftime("%Y-%m-%d %H:%M"), end.strftime("%Y-%m-%d %H:%M")]
+        if keep is None:
+            appends.append(values)
+        else:
+            updates[keep] = values
+        extra += [rid for rid in old if rid != keep]
+        merged += len(old)
+        spans.append((start, end))
+    added = [(rid, *_written(values)) for rid, values in updates.items()]
+    if updates:
+        table.update_by_ids(updates)
+    if appends:
+        row_ids = table.append_rows(appends) or [None] * len(appends)
+        added += [(rid, *_written(values)) for rid, values in zip(row_ids, appends)]
+    if extra:
+        table.delete_by_ids(extra)
+    _synced(table, intervals, removed=list(updates) + extra, added=added)
+    return spans, merged
+
+
+def delete_segment(table, row_id):
+    """Delete one sleep segment by row ID, keeping the cached intervals in step."""
+    with table.locked():
+        with _intervals_lock:
+            intervals = _intervals.get(table.name)
+        in_step = intervals is not None and intervals.frame is table.df
+        table.delete_by_id(row_id)
+        if in_step:
+            _synced(table, intervals, removed=[row_id])
+
+
+def save_segment(table, start, end, row_id=None):
+    """Save one sleep segment through save_segments(); `row_id` is the segment being edited, or None for a new one.
+
+    Returns the merged (start, end) and the number of other segments folded into it.
+    """
+    spans, merged = save_segments(table, [(start, end)], row_id=row_id)
+    return spans[0][0], spans[0][1], merged
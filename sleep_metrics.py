@@ -0,0 +1,167 @@
+import threading
+import numpy as np
+import pandas as pd
+import archive
+from sleep_data import NIGHT_OFFSET, parse_datetimes
+from sleep_stats import SECONDS_PER_DAY, nightly, sleep_periods
+
+# Nightly sleep the debt and chart target line are measured against.
+SLEEP_TARGET_HOURS = 7.0
+# Trailing windows (days) of the rolling average duration columns.
+ROLLING_WINDOWS = (7, 14, 30)
+# Trailing window (days) for the Sleep Regularity Index and social jetlag.
+REGULARITY_WINDOW = 7
+JETLAG_WINDOW = 28
+# Days before a changed night that are recomputed so every trailing window is complete.
+LOOKBACK_DAYS = max(ROLLING_WINDOWS + (REGULARITY_WINDOW, JETLAG_WINDOW))
+# Nights starting on these weekdays (Friday, Saturday) are free days for social jetlag.
+FREE_NIGHTS = (4, 5)
+MINUTES_PER_DAY = 24 * 60
+
+
+def _asleep_minutes(periods, first_night, days):
+    """Day-by-minute asleep matrix over noon-to-noon days starting at `first_night`."""
+    origin = np.datetime64(first_night + NIGHT_OFFSET, "m")
+    size = days * MINUTES_PER_DAY
+    lo = (periods["start"].to_numpy("datetime64[m]") - origin).astype(np.int64).clip(0, size)
+    hi = (periods["end"].to_numpy("datetime64[m]") - origin).astype(np.int64).clip(0, size)
+    edges = np.zeros(size + 1, dtype=int)
+    np.add.at(edges, lo, 1)
+    np.add.at(edges, hi, -1)
+    return (np.cumsum(edges[:-1]) > 0).reshape(days, MINUTES_PER_DAY)
+
+
+def _circular_rolling_mean(seconds, window):
+    """Trailing circular mean of clock times (seconds after midnight), NaN where the window has none."""
+    angles = seconds * (2 * np.pi / SECONDS_PER_DAY)
+    cos = pd.Series(np.cos(angles)).rolling(window, min_periods=1).sum()
+    sin = pd.Series(np.sin(angles)).rolling(window, min_periods=1).sum()
+    mean = (np.arctan2(sin, cos) % (2 * np.pi)) * SECONDS_PER_DAY / (2 * np.pi)
+    return mean.where(cos.notna()).to_numpy()
+
+
+def compute_daily(periods, nights, start_day, end_day, debt_before=0.0):
+    """Daily metrics from `start_day` to `end_day` (inclusive) given the segments and nights logged up to `end_day`.
+
+    `debt_before` is the sleep debt carried in from the day before `start_day`.
+    """
+    days = pd.date_range(start_day, end_day, freq="D")
+    daily = pd.DataFrame(index=days)
+    daily.index.name = "date"
+    hours = nights["hours"].reindex(days)
+    daily["duration"] = hours
+    for window in ROLLING_WINDOWS:
+        daily[f"avg_{window}d"] = hours.rolling(window, min_periods=1).mean()
+
+    # Debt grows by each logged night's shortfall and is paid back by extra sleep, never below zero:
+    # debt_t = S_t - min(min_k S_k, -debt_before), with S the running sum of (target - hours).
+    shortfall = (SLEEP_TARGET_HOURS - hours).fillna(0).to_numpy()
+    running = np.cumsum(shortfall)
+    floor = np.minimum(np.minimum.accumulate(np.minimum(running, 0)), -debt_before)
+    daily["sleep_debt"] = running - floor
+
+    # Sleep Regularity Index: chance of being in the same sleep/wake state 24 hours apart, scaled to -100..100.
+    logged = hours.notna().to_numpy()
+    asleep = _asleep_minutes(periods[periods["night"].between(days[0], days[-1])], days[0], len(days))
+    same = np.full(len(days), np.nan)
+    pairs = logged[1:] & logged[:-1]
+    same[1:][pairs] = (asleep[1:][pairs] == asleep[:-1][pairs]).mean(axis=1)
+    daily["regularity_index"] = 200 * pd.Series(same, index=days).rolling(REGULARITY_WINDOW, min_periods=1).mean() - 100
+
+    # Social jetlag: gap between mid-sleep on free nights and on work nights over the trailing window.
+    mid = nights["mid"].reindex(days).to_numpy()
+    free = days.weekday.isin(FREE_NIGHTS)
+    free_mid = _circular_rolling_mean(np.where(free, mid, np.nan), JETLAG_WINDOW)
+    work_mid = _circular_rolling_mean(np.where(~free, mid, np.nan), JETLAG_WINDOW)
+    gap = np.abs(free_mid - work_mid) % SECONDS_PER_DAY
+    daily["social_jetlag"] = np.minimum(gap, SECONDS_PER_DAY - gap) / 3600
+    return daily
+
+
+class SleepMetrics:
+    """Daily sleep metrics of one table, updated from the first changed night onward when its rows change."""
+
+    def __init__(self, table):
+        self.table = table
+        self.frames = None
+        self.periods = None
+        self.daily = pd.DataFrame()
+        self._lock = threading.Lock()
+
+    def _sources(self):
+        """Archived years and the live typed table; each is a new object whenever it is reloaded or patched."""
+        frames = [archive.read_year(self.table.name, year) for year in archive.years(self.table.name)]
+        frames.append(self.table.typed())
+        return frames
+
+    def _unchanged(self, frames):
+        """True if `frames` are the very objects the metrics were last computed from.
+
+        The frames themselves are kept, so an id() can't be reused by a new frame.
+        """
+        return self.frames is not None and len(frames) == len(self.frames) \
+            and all(new is old for new, old in zip(frames, self.frames))
+
+    def _periods(self, frames):
+        """Parsed (start, end) datetimes of every sleep row."""
+        frames = [archive.drop_live(f, frames[-1]) for f in frames[:-1]] + frames[-1:]
+        frames = [f for f in frames if not f.empty]
+        rows = pd.concat(frames, ignore_index=True) if frames \
+            else pd.DataFrame(columns=["sleep_start_datetime", "sleep_end_datetime"])
+        return parse_datetimes(rows["sleep_start_datetime"]), parse_datetimes(rows["sleep_end_datetime"])
+
+    def _first_change(self, periods):
+        """Earliest night with a segment added, removed or moved since the last computation, or None if none.
+
+        Every segment is compared, not just each night's main one, since naps count towards the regularity index.
+        """
+        if self.periods is None or self.daily.empty:
+            return periods["night"].min()
+        columns = ["night", "start", "end"]
+        # Number repeated segments so adding or removing an exact duplicate (which doubles its hours) shows up.
+        old, new = (p[columns].assign(copy=p.groupby(columns).cumcount()) for p in (self.periods, periods))
+        both = old.merge(new, how="outer", indicator=True)
+        changed = both.loc[both["_merge"] != "both", "night"]
+        return changed.min() if not changed.empty else None
+
+    def get(self):
+        """Return the daily metrics frame (one row per calendar day from the first logged night)."""
+        with self._lock:
+            frames = self._sources()
+            if self._unchanged(frames):
+                return self.daily
+            periods = sleep_periods(*self._periods(frames))
+            nights = nightly(periods)
+            if nights.empty:
+                self.frames, self.periods, self.daily = frames, periods, pd.DataFrame()
+                return self.daily
+            changed = self._first_change(periods)
+            if changed is not None:
+                first_day, last_day = nights.index.min(), nights.index.max()
+                if not self.daily.empty:
+                    # Days between the old last night and the first new one were never computed.
+                    changed = min(changed, self.daily.index.max() + pd.Timedelta(days=1))
+                changed = max(min(changed, last_day), first_day)
+                window_start = max(first_day, changed - pd.Timedelta(days=LOOKBACK_DAYS))
+                debt_before = 0.0
+                if window_start > first_day and not self.daily.empty:
+                    debt_before = float(self.daily["sleep_debt"].get(window_start - pd.Timedelta(days=1), 0.0))
+                fresh = compute_daily(periods[periods["night"] >= window_start], nights.loc[window_start:],
+                                      window_start, last_day, debt_before)
+                kept = self.daily.loc[first_day:changed - pd.Timedelta(days=1)] if not self.daily.empty else self.daily
+                self.daily = pd.concat([kept, fresh.loc[changed:]])
+            self.frames, self.periods = frames, periods
+            return self.daily
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_sleep_metrics(table):
+    """Return the process-wide daily metrics of a sleep table."""
+    with _metrics_lock:
+        metrics = _metrics.get(table.name)
+        if metrics is None:
+            metrics = _metrics[table.name] = SleepMetrics(table)
+    return metrics.get()
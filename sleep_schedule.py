@@ -1,148 +1,13 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from table_cache import get_table
 from datetime import date, time, datetime, timedelta
-import plotly.express as px
+from sleep_data import clean_sleep_data, delete_segment, night_segments, save_segment
+from sleep_metrics import SLEEP_TARGET_HOURS, get_sleep_metrics
+from sleep_stats import duration_hours, summarize
 
 
-def find_sleep_columns(df):
-    sleep_start_col = None
-    sleep_end_col = None
-    
-    if "sleep_start_datetime" in df.columns:
-        sleep_start_col = "sleep_start_datetime"
-    elif "sleep_start" in df.columns:
-        sleep_start_col = "sleep_start"
-    if "sleep_end_datetime" in df.columns:
-        sleep_end_col = "sleep_end_datetime"
-    elif "sleep_end" in df.columns:
-        sleep_end_col = "sleep_end"
-    
-    if not sleep_start_col:
-        possible_start_cols = [col for col in df.columns if 'start' in col.lower() or 'sleep' in col.lower()]
-        sleep_start_col = possible_start_cols[0] if possible_start_cols else None
-    
-    if not sleep_end_col:
-        possible_end_cols = [col for col in df.columns if 'end' in col.lower() or 'wake' in col.lower()]
-        sleep_end_col = possible_end_cols[0] if possible_end_cols else None
-    
-    if not sleep_start_col and len(df.columns) >= 1:
-        sleep_start_col = df.columns[0]
-    if not sleep_end_col and len(df.columns) >= 2:
-        sleep_end_col = df.columns[1]
-    
-    return sleep_start_col, sleep_end_col
-
-
-def parse_datetime_safe(series, default_date=None, date_series=None):
-    """Parse series of datetime or time strings to datetime objects. If date_series is provided, use it for time-only parsing (per-row date)."""
-    if default_date is None:
-        default_date = date.today()
-    parsed = []
-    for i, val in enumerate(series):
-        if pd.isna(val) or str(val).strip() == '':
-            parsed.append(pd.NaT)
-            continue
-        row_date = date_series.iloc[i] if date_series is not None and i < len(date_series) else default_date
-        if hasattr(row_date, 'date'):
-            row_date = row_date.date() if callable(getattr(row_date, 'date', None)) else row_date
-        s = str(val).strip()
-        dt = None
-        for fmt in ['%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S',
-                    '%d/%m/%Y %H:%M', '%m/%d/%Y %H:%M', '%H:%M', '%H:%M:%S', '%Y-%m-%d']:
-            try:
-                dt = datetime.strptime(s[:19] if len(s) > 19 else s, fmt)
-                if fmt in ('%H:%M', '%H:%M:%S'):
-                    dt = datetime.combine(row_date, dt.time())
-                elif fmt == '%Y-%m-%d':
-                    dt = datetime.combine(dt.date(), time(0, 0))
-                parsed.append(dt)
-                break
-            except (ValueError, TypeError):
-                continue
-        if dt is None:
-            parsed.append(pd.NaT)
-    return parsed
-
-
-def clean_sleep_data(df, sleep_start_col, sleep_end_col):
-    """Clean and parse sleep data from the dataframe."""
-    try:
-        # Clean the data first - remove any empty or invalid values
-        df_clean = df.dropna(subset=[sleep_start_col, sleep_end_col])
-        df_clean = df_clean[df_clean[sleep_start_col].astype(str).str.strip() != '']
-        df_clean = df_clean[df_clean[sleep_end_col].astype(str).str.strip() != '']
-        
-        if df_clean.empty:
-            return None
-        
-        # If sheet has a date column (old format), use it when parsing time-only
-        date_series = None
-        if "date" in df_clean.columns:
-            df_clean["date"] = pd.to_datetime(df_clean["date"])
-            date_series = df_clean["date"]
-        
-        # Parse datetime values (support both datetime and time-only for backward compat)
-        df_clean["sleep_start_datetime"] = parse_datetime_safe(df_clean[sleep_start_col], date_series=date_series)
-        df_clean["sleep_end_datetime"] = parse_datetime_safe(df_clean[sleep_end_col], date_series=date_series)
-        
-        # Remove rows where parsing failed
-        df_clean = df_clean.dropna(subset=["sleep_start_datetime", "sleep_end_datetime"])
-        # Derive date from sleep_start for filtering/charts
-        df_clean["date"] = pd.to_datetime(df_clean["sleep_start_datetime"]).dt.normalize()
-        
-        return df_clean if not df_clean.empty else None
-        
-    except Exception as e:
-        st.error(f"Error parsing datetime data: {str(e)}")
-        return None
-
-
-def get_prefill_datetimes(existing_row, default_start, default_end):
-    """Get prefill datetimes from existing row data."""
-    if not existing_row:
-        return default_start, default_end
-    
-    start_col, end_col = find_sleep_columns(pd.DataFrame([existing_row]))
-    if not start_col or not end_col or not existing_row.get(start_col) or not existing_row.get(end_col):
-        return default_start, default_end
-    
-    try:
-        start_str = str(existing_row[start_col]).strip()
-        end_str = str(existing_row[end_col]).strip()
-        if not start_str or not end_str:
-            return default_start, default_end
-        # Try datetime formats first, then time-only
-        for fmt in ['%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M', '%H:%M', '%H:%M:%S']:
-            try:
-                start_dt = datetime.strptime(start_str[:19], fmt)
-                end_dt = datetime.strptime(end_str[:19], fmt)
-                if fmt in ('%H:%M', '%H:%M:%S'):
-                    start_dt = datetime.combine(default_start.date(), start_dt.time())
-                    end_dt = datetime.combine(default_end.date(), end_dt.time())
-                return start_dt, end_dt
-            except (ValueError, TypeError):
-                continue
-    except Exception:
-        pass
-    return default_start, default_end
-
-
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-ws = client.open("sleep_schedule").sheet1
-
-if "sleep_df" not in st.session_state:
-    st.session_state.sleep_df = pd.DataFrame(ws.get_all_records())
+sleep_table = get_table("sleep_schedule")
 
 st.title("🧸 Sleep Schedule")
 
@@ -151,32 +16,23 @@ today = date.today()
 default_start = datetime.combine(today - timedelta(days=1), time(22, 0))
 default_end = datetime.combine(today, time(6, 0))
 
-df_records = st.session_state.sleep_df.to_dict(orient="records")
-existing_row_idx = None
-existing_row = None
-start_col, end_col = find_sleep_columns(st.session_state.sleep_df) if not st.session_state.sleep_df.empty else (None, None)
-for i, row in enumerate(df_records):
-    if start_col and row.get(start_col):
-        try:
-            s = str(row[start_col]).strip()
-            for fmt in ['%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M', '%H:%M', '%H:%M:%S']:
-                try:
-                    dt = datetime.strptime(s[:19], fmt)
-                    if fmt in ('%H:%M', '%H:%M:%S'):
-                        dt = datetime.combine(default_start.date(), dt.time())
-                    if dt.date() == default_start.date():
-                        existing_row_idx = i + 2
-                        existing_row = row
-                        break
-                    break
-                except (ValueError, TypeError):
-                    continue
-        except Exception:
-            pass
-    if existing_row_idx is not None:
-        break
-
-prefill_start, prefill_end = get_prefill_datetimes(existing_row, default_start, default_end)
+last_night = today - timedelta(days=1)
+segments = night_segments(sleep_table, last_night)
+existing_row_id = None
+prefill_start, prefill_end = default_start, default_end
+if not segments.empty:
+    # Pick a logged segment of last night to edit, or start a new one (e.g. a nap)
+    selected = st.radio(
+        "Segment",
+        range(len(segments) + 1),
+        format_func=lambda i: "➕ New segment" if i == len(segments) else
+        f"{segments['sleep_start_datetime'].iloc[i]:%H:%M}–{segments['sleep_end_datetime'].iloc[i]:%H:%M}",
+        horizontal=True,
+    )
+    if selected < len(segments):
+        existing_row_id = segments["row_id"].iloc[selected]
+        prefill_start = segments["sleep_start_datetime"].iloc[selected].to_pydatetime()
+        prefill_end = segments["sleep_end_datetime"].iloc[selected].to_pydatetime()
 
 col1, col2 = st.columns(2)
 sleep_start = col1.datetime_input("Sleep start", value=prefill_start)
@@ -186,61 +42,21 @@ col_save, col_delete = st.columns([1, 1])
 with col_save:
     save_clicked = st.button("☁️ Save")
 with col_delete:
-    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_idx is None))
+    delete_clicked = st.button("🗑️ Delete", disabled=(existing_row_id is None))
 
 if save_clicked:
-    start_str = sleep_start.strftime("%Y-%m-%d %H:%M")
-    end_str = sleep_end.strftime("%Y-%m-%d %H:%M")
-    if existing_row_idx:
-        ws.update(values=[[start_str, end_str]], range_name=f"A{existing_row_idx}:B{existing_row_idx}")
-        st.success(f"Updated sleep log for {sleep_start.date()}.")
-    else:
-        ws.append_row([start_str, end_str])
-        st.success(f"Added new sleep log for {sleep_start.date()}.")
-    st.session_state.sleep_df = pd.DataFrame(ws.get_all_records())
-
-if delete_clicked and existing_row_idx:
-    ws.delete_rows(existing_row_idx)
-    st.success("Deleted sleep log.")
-    st.session_state.sleep_df = pd.DataFrame(ws.get_all_records())
-
-if not st.session_state.sleep_df.empty:
-    df = st.session_state.sleep_df.copy()
-    sleep_start_col, sleep_end_col = find_sleep_columns(df)
-    
-    if not sleep_start_col or not sleep_end_col:
-        st.error("Could not find sleep start and end time columns in the data.")
-        st.stop()
-    
-    # Clean and parse the data
-    df_clean = clean_sleep_data(df, sleep_start_col, sleep_end_col)
-    
-    if df_clean is None:
-        st.warning("No valid sleep data found in the selected columns.")
-        st.stop()
-    
-    df = df_clean
-
-    # Compute sleep duration in hours (sleep_start_datetime and sleep_end_datetime are full datetimes)
-    def calc_duration(row):
-        start_dt = row["sleep_start_datetime"]
-        end_dt = row["sleep_end_datetime"]
-        if pd.isna(start_dt) or pd.isna(end_dt):
-            return None
-        if end_dt <= start_dt:
-            end_dt = end_dt + timedelta(days=1)
-        return round((end_dt - start_dt).total_seconds() / 3600, 2)
-
-    df["Sleep Duration (hrs)"] = df.apply(calc_duration, axis=1)
-
-    # Compute average times
-    def average_time(times):
-        seconds = [t.hour * 3600 + t.minute * 60 + t.second for t in times]
-        avg_seconds = sum(seconds) / len(seconds)
-        h = int(avg_seconds // 3600) % 24
-        m = int((avg_seconds % 3600) // 60)
-        return time(h, m)
-
+    merged_start, merged_end, merged = save_segment(sleep_table, sleep_start, sleep_end, row_id=existing_row_id)
+    action = "Updated" if existing_row_id is not None else "Added new"
+    st.success(f"{action} sleep log for {sleep_start.date()}.")
+    if merged:
+        st.info(f"Merged with {merged} overlapping segment(s): {merged_start:%H:%M}–{merged_end:%H:%M}.")
+
+if delete_clicked and existing_row_id is not None:
+    delete_segment(sleep_table, existing_row_id)
+    st.success("Deleted sleep segment.")
+
+min_date, max_date = sleep_table.date_bounds()
+if min_date is not None:
     st.write("")
     st.write("")
     header_col, col1, col2 = st.columns([2, 1, 1])
@@ -248,19 +64,6 @@ if not st.session_state.sleep_df.empty:
     with header_col:
         st.subheader("Sleep Schedule Analysis")
     
-    valid_dates = df["date"].dropna()
-    if valid_dates.empty:
-        st.warning("No valid dates found in the data.")
-        st.stop()
-    
-    min_date = valid_dates.min().date()
-    max_date = valid_dates.max().date()
-    
-    today = date.today()
-    if pd.isna(min_date) or pd.isna(max_date):
-        min_date = today
-        max_date = today
-    
     with col1:
         start_filter = st.date_input("Start date", min_value=min_date, max_value=max_date, value=min_date)
     with col2:
@@ -270,30 +73,54 @@ if not st.session_state.sleep_df.empty:
     if start_filter > end_filter:
         st.warning("Invalid date range: the start date cannot be after the end date.")
     else:
-        filtered_df = df[(df["date"].dt.date >= start_filter) & (df["date"].dt.date <= end_filter)].copy()
+        window = clean_sleep_data(sleep_table.read_range(start_filter, end_filter).copy(), "sleep_start_datetime", "sleep_end_datetime")
+        if window is not None:
+            filtered_df = window
+            filtered_df["Sleep Duration (hrs)"] = duration_hours(
+                filtered_df["sleep_start_datetime"], filtered_df["sleep_end_datetime"]).round(2)
 
     if not filtered_df.empty:
-        start_times = [x.time() for x in filtered_df["sleep_start_datetime"].dropna() if hasattr(x, 'time')]
-        end_times = [x.time() for x in filtered_df["sleep_end_datetime"].dropna() if hasattr(x, 'time')]
-        avg_start = average_time(start_times) if start_times else time(0, 0)
-        avg_end = average_time(end_times) if end_times else time(0, 0)
-        avg_duration = filtered_df["Sleep Duration (hrs)"].mean()
+        stats = summarize(filtered_df["sleep_start_datetime"], filtered_df["sleep_end_datetime"])
+        avg_start = stats["bedtime_mean"] or time(0, 0)
+        avg_end = stats["wake_mean"] or time(0, 0)
 
         # Metrics
         col3, col4, col5 = st.columns([1, 1, 1])
         with col3:
-            st.metric("Avg. Sleep Start", avg_start.strftime("%H:%M"))
+            st.metric("Avg. Sleep Start", avg_start.strftime("%H:%M"), help=f"Varies by ±{stats['bedtime_std_min']:.0f} min")
         with col4:
-            st.metric("Avg. Sleep End", avg_end.strftime("%H:%M"))
+            st.metric("Avg. Sleep End", avg_end.strftime("%H:%M"), help=f"Varies by ±{stats['wake_std_min']:.0f} min")
         with col5:
-            st.metric("Avg. Sleep Duration (hrs)", f"{avg_duration:.2f}")
-
-        # Line Chart
+            p10, p90 = stats["duration_percentiles"][10], stats["duration_percentiles"][90]
+            st.metric("Avg. Sleep Duration (hrs)", f"{stats['duration_mean']:.2f}", help=f"Most nights: {p10:.1f}–{p90:.1f} hrs")
+
+        # Rolling metrics as of the end of the selected range
+        daily_metrics = get_sleep_metrics(sleep_table)
+        trend = daily_metrics.loc[pd.Timestamp(start_filter):pd.Timestamp(end_filter)] if not daily_metrics.empty else daily_metrics
+        if not trend.empty:
+            latest = trend.iloc[-1]
+            col6, col7, col8, col9 = st.columns(4)
+            with col6:
+                st.metric("7-Day Avg. (hrs)", f"{latest['avg_7d']:.2f}",
+                          help=f"14-day: {latest['avg_14d']:.2f} hrs, 30-day: {latest['avg_30d']:.2f} hrs")
+            with col7:
+                st.metric("Sleep Debt (hrs)", f"{latest['sleep_debt']:.1f}",
+                          help=f"Accumulated shortfall against {SLEEP_TARGET_HOURS:.0f} hrs a night, paid back by longer nights")
+            with col8:
+                sri = latest["regularity_index"]
+                st.metric("Regularity Index", "–" if pd.isna(sri) else f"{sri:.0f}",
+                          help="How consistently you are asleep or awake at the same times on consecutive days (100 = identical)")
+            with col9:
+                jetlag = latest["social_jetlag"]
+                st.metric("Social Jetlag (hrs)", "–" if pd.isna(jetlag) else f"{jetlag:.1f}",
+                          help="Shift of mid-sleep on Friday/Saturday nights versus work nights over the last 4 weeks")
+
+        # Line Chart (segments of the same night are added up)
         duration_chart = (
             filtered_df[["date", "Sleep Duration (hrs)"]]
             .dropna(subset=["Sleep Duration (hrs)"])
+            .groupby("date", as_index=False)["Sleep Duration (hrs)"].sum()
             .sort_values("date")
-            .copy()
         )
         duration_chart["date"] = pd.to_datetime(duration_chart["date"]).dt.normalize()
         duration_chart = duration_chart.reset_index(drop=True)
@@ -309,6 +136,7 @@ if not st.session_state.sleep_df.empty:
         if duration_chart.empty:
             st.info("No duration data to plot for the selected date range.")
         else:
+            import plotly.express as px
             fig = px.line(
                 duration_chart,
                 x="date",
@@ -318,13 +146,16 @@ if not st.session_state.sleep_df.empty:
                 title="Sleep Duration Over Time",
             )
             fig.add_hline(
-                y=7,
+                y=SLEEP_TARGET_HOURS,
                 line_dash="dash",
                 line_color="#e7541e",
-                annotation_text="Target: 7.0 hrs",
+                annotation_text=f"Target: {SLEEP_TARGET_HOURS:.1f} hrs",
                 annotation_position="top left",
             )
             fig.update_traces(mode="lines+markers")
+            if not trend.empty:
+                fig.add_scatter(x=trend.index, y=trend["avg_7d"], mode="lines", name="7-day average",
+                                line=dict(color="#7fbfbf", dash="dot"))
             fig.update_layout(
                 xaxis_title="Date",
                 yaxis_title="Sleep Duration (hrs)",
@@ -347,7 +178,7 @@ if not st.session_state.sleep_df.empty:
             st.plotly_chart(fig, use_container_width=True)
 
         # Interactive Table
-        df_display = filtered_df.rename(columns={
+        df_display = filtered_df.drop(columns=["row_id"], errors="ignore").rename(columns={
             "date": "Date",
             "sleep_start_datetime": "Sleep Start",
             "sleep_end_datetime": "Sleep End"
@@ -0,0 +1,96 @@
+from datetime import time
+import numpy as np
+import pandas as pd
+from sleep_data import NIGHT_OFFSET
+
+SECONDS_PER_DAY = 24 * 3600
+# Percentiles of nightly duration reported by summarize().
+DURATION_PERCENTILES = (10, 50, 90)
+
+
+def duration_hours(start, end):
+    """Sleep length in hours for aligned start/end datetimes (NaN where either is missing).
+
+    An end at or before its start is taken to be on the following day.
+    """
+    start = pd.to_datetime(pd.Series(start)).to_numpy(dtype="datetime64[ns]")
+    end = pd.to_datetime(pd.Series(end)).to_numpy(dtype="datetime64[ns]")
+    hours = (end - start) / np.timedelta64(1, "h")
+    return np.where(hours <= 0, hours + 24, hours)
+
+
+def sleep_periods(start, end):
+    """One row per sleep segment: start, end (on the next day if at or before start), hours and night."""
+    periods = pd.DataFrame({"start": pd.Series(start).to_numpy(), "end": pd.Series(end).to_numpy()}).dropna()
+    periods["hours"] = duration_hours(periods["start"], periods["end"])
+    periods["end"] = periods["end"].where(periods["end"] > periods["start"], periods["end"] + pd.Timedelta(days=1))
+    periods["night"] = (periods["start"] - NIGHT_OFFSET).dt.normalize()
+    return periods
+
+
+def nightly(periods):
+    """One row per night from sleep_periods(): total hours, plus start, end and mid-sleep clock time of the main
+    (longest) segment, so naps add to the total without moving bedtime."""
+    if periods.empty:
+        return pd.DataFrame(columns=["start", "end", "hours", "mid"], index=pd.DatetimeIndex([], name="night"))
+    main = periods.loc[periods.groupby("night")["hours"].idxmax()].set_index("night")[["start", "end"]]
+    nights = main.assign(hours=periods.groupby("night")["hours"].sum())
+    nights["mid"] = clock_seconds(nights["start"] + (nights["end"] - nights["start"]) / 2)
+    return nights.sort_index()
+
+
+def clock_seconds(values):
+    """Seconds after midnight of each datetime, as a float array (NaN where missing)."""
+    values = pd.to_datetime(pd.Series(values))
+    seconds = (values - values.dt.normalize()) / pd.Timedelta(seconds=1)
+    return seconds.to_numpy(dtype=float, na_value=np.nan)
+
+
+def circular_time_stats(seconds):
+    """Circular mean and standard deviation of clock times given in seconds after midnight.
+
+    Times are treated as angles on a 24-hour clock, so 23:30 and 00:30 average to
+    00:00 rather than noon. Returns (mean_seconds, std_seconds); NaN if no values.
+    """
+    seconds = np.asarray(seconds, dtype=float)
+    seconds = seconds[~np.isnan(seconds)]
+    if seconds.size == 0:
+        return np.nan, np.nan
+    angles = seconds * (2 * np.pi / SECONDS_PER_DAY)
+    c, s = np.cos(angles).mean(), np.sin(angles).mean()
+    resultant = min(np.hypot(c, s), 1.0)
+    mean = (np.arctan2(s, c) % (2 * np.pi)) * SECONDS_PER_DAY / (2 * np.pi)
+    std = np.sqrt(-2 * np.log(resultant)) * SECONDS_PER_DAY / (2 * np.pi) if resultant > 0 else np.inf
+    return float(mean), float(std)
+
+
+def seconds_to_time(seconds):
+    """Clock time for a number of seconds after midnight (wrapping past 24h); None for NaN."""
+    if seconds is None or np.isnan(seconds):
+        return None
+    seconds = int(round(seconds)) % SECONDS_PER_DAY
+    return time(seconds // 3600, (seconds % 3600) // 60)
+
+
+def summarize(start, end):
+    """Per-night duration, bedtime and wake-time statistics for aligned segment start/end datetimes.
+
+    Segments of the same night (naps, split sleep) are added up first. Durations are in
+    hours, clock-time spreads in minutes; bedtime/wake means are datetime.time (None
+    when there is no data).
+    """
+    nights = nightly(sleep_periods(start, end))
+    valid = nights["hours"].to_numpy(dtype=float)
+    bed_mean, bed_std = circular_time_stats(clock_seconds(nights["start"]))
+    wake_mean, wake_std = circular_time_stats(clock_seconds(nights["end"]))
+    return {
+        "nights": int(valid.size),
+        "duration_mean": float(valid.mean()) if valid.size else np.nan,
+        "duration_std": float(valid.std()) if valid.size else np.nan,
+        "duration_percentiles": dict(zip(DURATION_PERCENTILES, np.percentile(valid, DURATION_PERCENTILES).tolist()))
+        if valid.size else {},
+        "bedtime_mean": seconds_to_time(bed_mean),
+        "bedtime_std_min": bed_std / 60,
+        "wake_mean": seconds_to_time(wake_mean),
+        "wake_std_min": wake_std / 60,
+    }
@@ -0,0 +1,437 @@
+import os
+import sqlite3
+import threading
+import gspread
+from gspread.utils import rowcol_to_a1
+import pandas as pd
+import streamlit as st
+from schema import ROW_ID_COLUMN, get_schema
+from sheets_client import sheets_client
+from sleep_data import parse_datetimes
+from write_queue import (append_rows_op, delete_rows_op, delete_rows_request, fill_column_op, update_cells_request,
+                         update_row_op, write_queue)
+
+DEFAULT_SQLITE_PATH = os.path.join("data", "bewell360.db")
+# Values SQLite can compare as dates by their first ten characters; anything else is parsed in pandas.
+ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*"
+
+
+def _date_bounds(values):
+    """(first, last) date among date or datetime strings, or (None, None) if none parse."""
+    dates = parse_datetimes(pd.Series(values, dtype=object)).dropna()
+    if dates.empty:
+        return None, None
+    return dates.min().date(), dates.max().date()
+
+
+def _column_runs(indices):
+    """Group 0-based column (or row) indices into contiguous (start, end) runs."""
+    runs = []
+    for i in sorted(indices):
+        if runs and i == runs[-1][1] + 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return runs
+
+
+class StorageBackend:
+    """Table storage used by the data layer.
+
+    Rows are addressed by a key ({column: value}); callers that already know a row's
+    position in read_table() order pass it as `position` to skip the lookup.
+    Mutations may return a Future that resolves once the write is durable.
+    """
+
+    def read_table(self, name):
+        raise NotImplementedError
+
+    def revision(self, name):
+        """Return a token that changes whenever the table changes, or None if unknown."""
+        return None
+
+    def pending(self, name):
+        """Return True while writes to the table are queued and not yet stored."""
+        return False
+
+    def written_revision(self, name):
+        """Return the revision our own last writes produced, if the backend knows it, else None."""
+        return None
+
+    def read_date_range(self, name, start, end, date_col="date"):
+        """Return rows whose `date_col` falls between `start` and `end` (inclusive)."""
+        df = self.read_table(name)
+        if df.empty or date_col not in df.columns:
+            return df
+        dates = pd.to_datetime(df[date_col], errors="coerce").dt.date
+        return df[(dates >= start) & (dates <= end)].reset_index(drop=True)
+
+    def date_bounds(self, name, date_col="date"):
+        """Return the (first, last) date in `date_col`, or (None, None) if there are none."""
+        df = self.read_table(name)
+        if df.empty or date_col not in df.columns:
+            return None, None
+        return _date_bounds(df[date_col])
+
+    def upsert(self, name, key, row, position=None):
+        raise NotImplementedError
+
+    def delete(self, name, key, position=None):
+        raise NotImplementedError
+
+    def update_rows(self, name, updates):
+        """Apply several (key, row, position) updates to existing rows."""
+        ack = None
+        for key, row, position in updates:
+            ack = self.upsert(name, key, row, position=position)
+        return ack
+
+    def delete_rows(self, name, rows):
+        """Delete several (key, position) rows, bottom-up so earlier positions stay valid."""
+        ack = None
+        for key, position in sorted(rows, key=lambda r: r[1], reverse=True):
+            ack = self.delete(name, key, position=position)
+        return ack
+
+    def append_rows(self, name, rows):
+        raise NotImplementedError
+
+    def ensure_table(self, name, columns):
+        raise NotImplementedError
+
+    def fill_column(self, name, column, values):
+        """Overwrite `column` for every row (in read_table() order), adding the column if missing."""
+        raise NotImplementedError
+
+    def _locate(self, df, key):
+        """Return the position of the first row matching every key column, or None."""
+        if df.empty or not key:
+            return None
+        mask = pd.Series(True, index=df.index)
+        for col, val in key.items():
+            if col not in df.columns:
+                return None
+            mask &= df[col].astype(str) == str(val)
+        matches = mask.to_numpy().nonzero()[0]
+        return int(matches[0]) if len(matches) else None
+
+
+class SheetsBackend(StorageBackend):
+    """Google Sheets storage: one spreadsheet per table, header in row 1.
+
+    Mutations are queued on the write-behind queue and return its Future. Rows with
+    an ID are addressed by it, so queued edits survive rows moving in the meantime.
+    """
+
+    def __init__(self):
+        self._headers = {}
+
+    def _header(self, name):
+        if name not in self._headers:
+            self._headers[name] = sheets_client.worksheet(name).row_values(1)
+        return self._headers[name]
+
+    def _id_column(self, name, key):
+        """0-based index of the row ID column if `key` names a row by ID, else None."""
+        header = self._header(name)
+        if key and ROW_ID_COLUMN in key and ROW_ID_COLUMN in header:
+            return header.index(ROW_ID_COLUMN)
+        return None
+
+    def _row_requests(self, name, sheet_id, key, row, position):
+        """Update requests (or one row-ID op) writing `row` into the row named by `key`/`position`."""
+        header = self._header(name)
+        indices = [header.index(col) for col in row if col in header]
+        runs = [(start, [row[header[i]] for i in range(start, end + 1)]) for start, end in _column_runs(indices)]
+        if not runs:
+            return []
+        id_col = self._id_column(name, key)
+        if id_col is not None:
+            return [update_row_op(sheet_id, id_col, key[ROW_ID_COLUMN], runs)]
+        return [update_cells_request(sheet_id, position + 1, start, values) for start, values in runs]
+
+    def read_table(self, name):
+        return pd.DataFrame(sheets_client.worksheet(name).get_all_records())
+
+    def read_date_range(self, name, start, end, date_col="date"):
+        """Read the date column, then fetch only the grid rows spanning matches in [start, end]."""
+        header = self._header(name)
+        date_col = self._actual_column(name, date_col)
+        if date_col is None:
+            return super().read_date_range(name, start, end)
+        ws = sheets_client.worksheet(name)
+        dates = parse_datetimes(pd.Series(ws.col_values(header.index(date_col) + 1)[1:], dtype=object)).dt.normalize()
+        in_range = (dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))
+        rows = [i + 2 for i in in_range.to_numpy().nonzero()[0]]
+        if not rows:
+            return pd.DataFrame(columns=header)
+        values = ws.get(f"A{rows[0]}:{rowcol_to_a1(rows[-1], len(header))}")
+        wanted = set(rows)
+        records = [(row + [""] * len(header))[:len(header)]
+                   for offset, row in enumerate(values) if rows[0] + offset in wanted]
+        return pd.DataFrame(records, columns=header)
+
+    def date_bounds(self, name, date_col="date"):
+        """Read only the date column."""
+        actual = self._actual_column(name, date_col)
+        if actual is None:
+            return super().date_bounds(name, date_col)
+        return _date_bounds(sheets_client.worksheet(name).col_values(self._header(name).index(actual) + 1)[1:])
+
+    def _actual_column(self, name, column):
+        """Sheet header naming the canonical `column`, or None if the sheet has no such column."""
+        header = self._header(name)
+        if column in header:
+            return column
+        schema = get_schema(name)
+        return next((a for a, c in schema.resolve(header).items() if c == column), None) if schema else None
+
+    def revision(self, name):
+        """Drive modifiedTime of the table's spreadsheet (one metadata request, no cell data).
+
+        None while journaled writes are still waiting to reach the sheet, so the
+        locally patched copy is kept instead of a remote one that lacks them. The
+        queue's own worker sends them; reads never wait on it.
+        """
+        if write_queue.pending(name):
+            return None
+        return sheets_client.spreadsheet(name).get_lastUpdateTime()
+
+    def pending(self, name):
+        return write_queue.pending(name)
+
+    def written_revision(self, name):
+        return write_queue.landed_revision(name)
+
+    def upsert(self, name, key, row, position=None):
+        if position is None:
+            position = self._locate(self.read_table(name), key)
+        header = self._header(name)
+        if position is None:
+            return self.append_rows(name, [[row.get(col, key.get(col, "")) for col in header]])
+        requests = self._row_requests(name, sheets_client.worksheet(name).id, key, row, position)
+        return write_queue.submit(name, requests) if requests else None
+
+    def update_rows(self, name, updates):
+        """Update many rows in one batch; rows must already exist."""
+        sheet_id = sheets_client.worksheet(name).id
+        requests = []
+        for key, row, position in updates:
+            requests.extend(self._row_requests(name, sheet_id, key, row, position))
+        return write_queue.submit(name, requests) if requests else None
+
+    def delete(self, name, key, position=None):
+        return self.delete_rows(name, [(key, position)])
+
+    def delete_rows(self, name, rows):
+        """Delete many (key, position) rows in one batch: by ID where known, else contiguous position runs bottom-up."""
+        sheet_id = sheets_client.worksheet(name).id
+        by_id, positions = [], set()
+        for key, position in rows:
+            if self._id_column(name, key) is not None:
+                by_id.append(key[ROW_ID_COLUMN])
+                continue
+            if position is None:
+                position = self._locate(self.read_table(name), key)
+            if position is not None:
+                positions.add(position)
+        requests = [delete_rows_request(sheet_id, start + 1, end + 2) for start, end in reversed(_column_runs(positions))]
+        if by_id:
+            requests.append(delete_rows_op(sheet_id, self._header(name).index(ROW_ID_COLUMN), by_id))
+        return write_queue.submit(name, requests) if requests else None
+
+    def append_rows(self, name, rows):
+        rows = [list(r) for r in rows]
+        if not rows:
+            return None
+        header = self._header(name)
+        id_col = header.index(ROW_ID_COLUMN) if ROW_ID_COLUMN in header else None
+        sheet_id = sheets_client.worksheet(name).id
+        return write_queue.submit(name, [append_rows_op(sheet_id, id_col, rows)])
+
+    def ensure_table(self, name, columns):
+        try:
+            sheets_client.worksheet(name)
+        except gspread.SpreadsheetNotFound:
+            ws = sheets_client.create(name).sheet1
+            ws.append_row(list(columns))
+
+    def fill_column(self, name, column, values):
+        header = self._header(name)
+        sheet_id = sheets_client.worksheet(name).id
+        requests = []
+        if column not in header:
+            requests.append(update_cells_request(sheet_id, 0, len(header), [column]))
+            self._headers[name] = header = header + [column]
+        if values:
+            requests.append(fill_column_op(sheet_id, header.index(column), values))
+        return write_queue.submit(name, requests)
+
+
+class SQLiteBackend(StorageBackend):
+    """Local SQLite storage: one table per sheet, rows kept in insertion (rowid) order."""
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._columns = {}
+
+    def _table_columns(self, name, extra=()):
+        """Return the table's columns, creating the table or adding columns as needed."""
+        columns = self._columns.get(name)
+        if columns is None:
+            existing = [r[1] for r in self._conn.execute(f'PRAGMA table_info("{name}")')]
+            if not existing:
+                schema = get_schema(name)
+                existing = (list(schema.columns) if schema else []) or list(extra)
+                if not existing:
+                    return []
+                if ROW_ID_COLUMN not in existing:
+                    existing.append(ROW_ID_COLUMN)
+                cols_sql = ", ".join(f'"{c}"' for c in existing)
+                self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({cols_sql})')
+                if "date" in existing:
+                    self._conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}_date" ON "{name}" ("date")')
+            columns = self._columns[name] = existing
+        for col in extra:
+            if col not in columns:
+                self._conn.execute(f'ALTER TABLE "{name}" ADD COLUMN "{col}"')
+                columns.append(col)
+        return columns
+
+    def _rowid(self, name, key, position):
+        if key and ROW_ID_COLUMN in key:
+            found = self._conn.execute(
+                f'SELECT rowid FROM "{name}" WHERE "{ROW_ID_COLUMN}" = ? LIMIT 1', (str(key[ROW_ID_COLUMN]),)
+            ).fetchone()
+        elif position is not None:
+            found = self._conn.execute(
+                f'SELECT rowid FROM "{name}" ORDER BY rowid LIMIT 1 OFFSET ?', (int(position),)
+            ).fetchone()
+        elif key:
+            where = " AND ".join(f'"{c}" = ?' for c in key)
+            found = self._conn.execute(
+                f'SELECT rowid FROM "{name}" WHERE {where} ORDER BY rowid LIMIT 1', list(key.values())
+            ).fetchone()
+        else:
+            found = None
+        return found[0] if found else None
+
+    def _query(self, name, where="", params=()):
+        with self._lock:
+            columns = self._table_columns(name)
+            if not columns:
+                return pd.DataFrame()
+            cols_sql = ", ".join(f'"{c}"' for c in columns)
+            df = pd.read_sql_query(f'SELECT {cols_sql} FROM "{name}" {where} ORDER BY rowid', self._conn, params=params)
+        return df if not df.empty else pd.DataFrame()
+
+    def read_table(self, name):
+        return self._query(name)
+
+    def revision(self, name):
+        """SQLite data_version: changes only when another connection commits."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def read_date_range(self, name, start, end, date_col="date"):
+        """Filter ISO dates in SQL; rows in other layouts (e.g. 15/03/2026 23:00) are parsed and filtered here."""
+        df = self._query(name, f'WHERE substr("{date_col}", 1, 10) BETWEEN ? AND ? OR "{date_col}" NOT GLOB ?',
+                         (str(start), str(end), ISO_DATE_GLOB))
+        if df.empty:
+            return df
+        dates = parse_datetimes(df[date_col]).dt.normalize()
+        return df[(dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))].reset_index(drop=True)
+
+    def date_bounds(self, name, date_col="date"):
+        """Bound ISO dates in SQL; only rows in other layouts are read and parsed here."""
+        with self._lock:
+            if date_col not in self._table_columns(name):
+                return None, None
+            iso = self._conn.execute(f'SELECT MIN(substr("{date_col}", 1, 10)), MAX(substr("{date_col}", 1, 10)) '
+                                     f'FROM "{name}" WHERE "{date_col}" GLOB ?', (ISO_DATE_GLOB,)).fetchone()
+            other = [r[0] for r in self._conn.execute(f'SELECT "{date_col}" FROM "{name}" WHERE "{date_col}" NOT GLOB ?',
+                                                      (ISO_DATE_GLOB,))]
+        return _date_bounds([v for v in iso if v is not None] + other)
+
+    def upsert(self, name, key, row, position=None):
+        with self._lock, self._conn:
+            columns = self._table_columns(name, extra=list(row) + list(key))
+            rowid = self._rowid(name, key, position)
+            if rowid is None:
+                values = {**{c: "" for c in columns}, **key, **row}
+                cols_sql = ", ".join(f'"{c}"' for c in values)
+                marks = ", ".join("?" for _ in values)
+                self._conn.execute(f'INSERT INTO "{name}" ({cols_sql}) VALUES ({marks})', list(values.values()))
+            elif row:
+                sets = ", ".join(f'"{c}" = ?' for c in row)
+                self._conn.execute(f'UPDATE "{name}" SET {sets} WHERE rowid = ?', list(row.values()) + [rowid])
+
+    def update_rows(self, name, updates):
+        with self._lock, self._conn:
+            for key, row, position in updates:
+                self._table_columns(name, extra=list(row))
+                rowid = self._rowid(name, key, position)
+                if rowid is not None and row:
+                    sets = ", ".join(f'"{c}" = ?' for c in row)
+                    self._conn.execute(f'UPDATE "{name}" SET {sets} WHERE rowid = ?', list(row.values()) + [rowid])
+
+    def delete(self, name, key, position=None):
+        with self._lock, self._conn:
+            self._table_columns(name)
+            rowid = self._rowid(name, key, position)
+            if rowid is not None:
+                self._conn.execute(f'DELETE FROM "{name}" WHERE rowid = ?', (rowid,))
+
+    def delete_rows(self, name, rows):
+        with self._lock, self._conn:
+            self._table_columns(name)
+            rowids = {self._rowid(name, key, position) for key, position in rows}
+            self._conn.executemany(f'DELETE FROM "{name}" WHERE rowid = ?', [(r,) for r in rowids if r is not None])
+
+    def append_rows(self, name, rows):
+        rows = [list(r) for r in rows]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            columns = self._table_columns(name)
+            width = len(columns)
+            rows = [(r + [""] * width)[:width] for r in rows]
+            cols_sql = ", ".join(f'"{c}"' for c in columns)
+            marks = ", ".join("?" for _ in columns)
+            self._conn.executemany(f'INSERT INTO "{name}" ({cols_sql}) VALUES ({marks})', rows)
+
+    def ensure_table(self, name, columns):
+        with self._lock, self._conn:
+            self._table_columns(name, extra=list(columns))
+
+    def fill_column(self, name, column, values):
+        with self._lock, self._conn:
+            self._table_columns(name, extra=[column])
+            rowids = [r[0] for r in self._conn.execute(f'SELECT rowid FROM "{name}" ORDER BY rowid')]
+            self._conn.executemany(f'UPDATE "{name}" SET "{column}" = ? WHERE rowid = ?', list(zip(values, rowids)))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the configured storage backend (secrets: [storage] backend = "sheets" | "sqlite")."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    config = st.secrets.get("storage", {})
+                except FileNotFoundError:
+                    config = {}
+                if config.get("backend", "sheets") == "sqlite":
+                    _backend = SQLiteBackend(config.get("sqlite_path", DEFAULT_SQLITE_PATH))
+                else:
+                    _backend = SheetsBackend()
+    return _backend
@@ -0,0 +1,588 @@
+import threading
+import time
+import uuid
+from bisect import insort
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import archive
+import quota
+from schema import ROW_ID_COLUMN, get_schema, row_dates, table_names
+from storage import get_backend
+
+# Seconds a locally patched table is served before the next read reconciles it with the backend.
+RECONCILE_AFTER = 300
+# Seconds between checks of the backend revision; within this window the cached copy is served as is.
+PROBE_INTERVAL = 30
+# Seconds a table snapshot may sit unused before it is dropped from memory.
+SNAPSHOT_TTL = 900
+# Upper bound on the memory held by cached snapshots across all tables and sessions.
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+# Tables loaded at once by prefetch(); well under the Sheets connection pool size.
+PREFETCH_WORKERS = 8
+# Append-only log tables whose closed years are moved to the Parquet archive.
+ARCHIVED_TABLES = (
+    "fitness_activities",
+    "nutrition_and_hydration",
+    "professional_development_and_personal_growth",
+    "sleep_schedule",
+    "daily_ai_insights",
+)
+# Days into a new year during which last year's rows stay in the live sheet for late edits.
+ARCHIVE_GRACE_DAYS = 31
+
+
+def normalize_key(value):
+    """Canonical form of a key cell: trimmed, case-insensitive text."""
+    return str(value).strip().lower()
+
+
+def new_row_id():
+    """Random row ID; the letter prefix keeps Sheets from reading it as a number."""
+    return "r" + uuid.uuid4().hex[:12]
+
+
+class TableCache:
+    """Write-through cache of one table: writes go to the storage backend and are applied to the cached DataFrame.
+
+    One instance per table is shared by every session. The cached snapshot for the
+    current revision is never modified in place; writes swap in a patched copy, so
+    frames already handed to a rerun stay consistent.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.df = None
+        self.dirty_since = None
+        self.revision = None
+        self.checked_at = 0
+        self.used_at = time.time()
+        self.nbytes = 0
+        self._lock = threading.RLock()
+        self._write_failed = False
+        self._indexes = {}
+        self._typed = None
+        self._dates = None
+        self._mapping = None
+        self._bounds = None
+
+    def frame(self):
+        """Return the cached table, loading it on first use or when the backend reports a change."""
+        with self._lock:
+            self.used_at = time.time()
+            if self.df is None:
+                return self.reload()
+            if self._write_failed and not get_backend().pending(self.name):
+                return self.reload()
+            if time.time() - self.checked_at > PROBE_INTERVAL:
+                return self.refresh()
+            return self.df
+
+    def locked(self):
+        """Hold the table's lock, so a group of writes and the caller's bookkeeping on them aren't interleaved with other writers."""
+        return self._lock
+
+    def snapshot(self):
+        """Return the table without keeping it in the cache: the cached copy if loaded, else a one-off backend read."""
+        with self._lock:
+            if self.df is not None or get_backend().pending(self.name):
+                return self.frame()
+        return get_backend().read_table(self.name)
+
+    def refresh(self):
+        """Check the backend revision now and reload only if the table changed."""
+        with self._lock:
+            if self.df is None:
+                return self.reload()
+            self.checked_at = time.time()
+            try:
+                revision = get_backend().revision(self.name)
+            except Exception:
+                return self.df
+            if revision is None:
+                # Queued writes are not in the backend copy yet; reloading now would drop them.
+                if self.dirty_since is not None and time.time() - self.dirty_since > RECONCILE_AFTER \
+                        and not get_backend().pending(self.name):
+                    return self.reload()
+                return self.df
+            if revision != self.revision:
+                if self.dirty_since is not None and revision == get_backend().written_revision(self.name):
+                    # Only our own queued writes landed, and they are already patched into the cache.
+                    self.revision = revision
+                    self.dirty_since = None
+                    return self.df
+                return self.reload()
+            return self.df
+
+    def reload(self):
+        """Read the whole table from the backend and replace the cached copy."""
+        with self._lock:
+            backend = get_backend()
+            try:
+                self.revision = backend.revision(self.name)
+            except Exception:
+                self.revision = None
+            self.checked_at = time.time()
+            self._write_failed = False
+            self.df = backend.read_table(self.name)
+            self._ensure_row_ids(backend)
+            self.nbytes = int(self.df.memory_usage(deep=True).sum())
+            self.dirty_since = None
+            self._indexes = {}
+            self._typed = None
+            self._dates = None
+            self._mapping = None
+            return self.df
+
+    def invalidate(self):
+        """Drop the cached table so the next read fetches it again."""
+        with self._lock:
+            self.df = None
+            self._bounds = None
+            self.dirty_since = None
+            self._indexes = {}
+            self._typed = None
+            self._dates = None
+            self._mapping = None
+
+    def _ensure_row_ids(self, backend):
+        """Give every row a stable ID, adding the ID column to the table on first use."""
+        df = self.df
+        if len(df.columns) == 0:
+            return
+        if ROW_ID_COLUMN in df.columns:
+            ids = [str(v).strip() if pd.notna(v) and str(v).strip() not in ("nan", "None") else "" for v in df[ROW_ID_COLUMN]]
+        else:
+            ids = [""] * len(df)
+        if all(ids) and ROW_ID_COLUMN in df.columns:
+            return
+        ids = [v or new_row_id() for v in ids]
+        df = df.copy()
+        df[ROW_ID_COLUMN] = ids
+        self.df = df
+        self._track(backend.fill_column(self.name, ROW_ID_COLUMN, ids))
+
+    def row_id(self, position):
+        """Return the stable ID of the row at DataFrame `position`."""
+        with self._lock:
+            return self.frame()[ROW_ID_COLUMN].iat[position]
+
+    def position_of(self, row_id):
+        """Return the current position of the row with `row_id`; KeyError if it no longer exists."""
+        with self._lock:
+            positions = self._index((ROW_ID_COLUMN,)).get((normalize_key(row_id),))
+            if not positions:
+                raise KeyError(f"Row {row_id} no longer exists in {self.name}")
+            return positions[0]
+
+    def _column_map(self):
+        """Return {actual column: canonical column}, resolved once per load."""
+        if self._mapping is None:
+            schema = get_schema(self.name)
+            columns = self.frame().columns
+            self._mapping = schema.resolve(columns) if schema else {c: c for c in columns}
+        return self._mapping
+
+    def typed(self):
+        """Return the table with canonical column names and schema dtypes, coerced once per change."""
+        with self._lock:
+            df = self.frame()
+            if self._typed is None:
+                schema = get_schema(self.name)
+                self._typed = schema.coerce(df) if schema else df.copy()
+            return self._typed
+
+    def _date_index(self):
+        """Return (sorted row dates, their positions), built once per change."""
+        if self._dates is None:
+            dates = row_dates(self.name, self.typed())
+            valid = dates.notna().to_numpy()
+            values = dates.to_numpy()[valid]
+            positions = np.flatnonzero(valid)
+            order = np.argsort(values, kind="stable")
+            self._dates = (values[order], positions[order])
+        return self._dates
+
+    def _date_column(self):
+        schema = get_schema(self.name)
+        return schema.date_column if schema else "date"
+
+    def _loaded(self):
+        """True if reads must go through the cached copy: it is loaded, or it holds writes the backend lacks."""
+        return self.df is not None or get_backend().pending(self.name)
+
+    def date_bounds(self):
+        """Return the (first, last) date in the table and its archive, or (None, None) if there are none.
+
+        A table that isn't loaded is not loaded for this; the backend is asked for the
+        bounds of its date column, and the answer is kept for PROBE_INTERVAL.
+        """
+        with self._lock:
+            if self._loaded():
+                values, _ = self._date_index()
+                live = [pd.Timestamp(values[0]).date(), pd.Timestamp(values[-1]).date()] if len(values) else []
+            else:
+                if self._bounds is None or time.time() - self._bounds[0] > PROBE_INTERVAL:
+                    self._bounds = (time.time(), get_backend().date_bounds(self.name, date_col=self._date_column()))
+                live = list(self._bounds[1])
+            bounds = [d for d in list(archive.date_bounds(self.name)) + live if d is not None]
+            if not bounds:
+                return None, None
+            return min(bounds), max(bounds)
+
+    def read_range(self, start, end):
+        """Return typed rows dated between `start` and `end` (inclusive), archived years first.
+
+        A loaded table is sliced through its sorted date index; otherwise only the
+        window is fetched from the backend.
+        """
+        with self._lock:
+            if not self._loaded():
+                schema = get_schema(self.name)
+                df = get_backend().read_date_range(self.name, start, end, date_col=self._date_column())
+                live = schema.coerce(df) if schema else df
+            else:
+                values, positions = self._date_index()
+                lo = np.searchsorted(values, pd.Timestamp(start).to_datetime64(), side="left")
+                hi = np.searchsorted(values, pd.Timestamp(end + timedelta(days=1)).to_datetime64(), side="left")
+                live = self.typed().iloc[np.sort(positions[lo:hi])]
+        archived = archive.drop_live(archive.read_range(self.name, start, end), live)
+        if archived.empty:
+            return live
+        return pd.concat([archived, live], ignore_index=True)
+
+    def archive_closed_years(self, today=None):
+        """Move rows of closed years into the Parquet archive and delete them from the live table.
+
+        Only rows whose ID is read back from the written archive file are deleted.
+        Returns the number of rows moved.
+        """
+        today = today or date.today()
+        cutoff_year = today.year if (today - date(today.year, 1, 1)).days >= ARCHIVE_GRACE_DAYS else today.year - 1
+        with self._lock:
+            typed = self.typed()
+            if ROW_ID_COLUMN not in typed.columns:
+                return 0
+            dates = row_dates(self.name, typed)
+            old = (dates < pd.Timestamp(cutoff_year, 1, 1)).to_numpy()
+            if not old.any():
+                return 0
+            years = dates[old].dt.year
+            for year, rows in typed[old].groupby(years):
+                archive.write_year(self.name, year, rows)
+            stored = {year: archive.stored_ids(self.name, year) for year in years.unique()}
+            ids = typed[ROW_ID_COLUMN].astype(str).to_numpy()
+            moved = [p for p, year in zip(np.flatnonzero(old), years) if ids[p] in stored[year]]
+            self.delete_rows(moved)
+            return len(moved)
+
+    def _index(self, columns):
+        """Return {normalized key: [positions]} for `columns`, building it once per load."""
+        index = self._indexes.get(columns)
+        if index is None:
+            df = self.frame()
+            index = {}
+            if all(col in df.columns for col in columns):
+                keys = zip(*(df[col].astype(str).str.strip().str.lower() for col in columns))
+                for position, key in enumerate(keys):
+                    index.setdefault(key, []).append(position)
+            self._indexes[columns] = index
+        return index
+
+    def find(self, *values, columns=("date",)):
+        """Return the first live row (a dict) whose `columns` match `values`, or None.
+
+        Columns and row keys use canonical (schema) names. When the first column is the
+        date column it is matched by date, whatever its layout, and a table that isn't
+        loaded only has that day's rows fetched. A match without a row ID (a legacy row)
+        loads the table, which assigns the missing IDs.
+        """
+        with self._lock:
+            if columns[0] == self._date_column():
+                day = pd.Timestamp(values[0]).date()
+                if self._loaded():
+                    mapping = self._column_map()
+                    dates, positions = self._date_index()
+                    lo, hi = np.searchsorted(dates, [pd.Timestamp(day).to_datetime64(),
+                                                     pd.Timestamp(day + timedelta(days=1)).to_datetime64()])
+                    rows = self.df.iloc[np.sort(positions[lo:hi])].rename(columns=mapping)
+                else:
+                    rows = get_backend().read_date_range(self.name, day, day, date_col=columns[0])
+                    schema = get_schema(self.name)
+                    rows = rows.rename(columns=schema.resolve(rows.columns)) if schema else rows
+                keys = tuple(normalize_key(v) for v in values[1:])
+                match = next((row for row in rows.to_dict("records")
+                              if tuple(normalize_key(row.get(c, "")) for c in columns[1:]) == keys), None)
+                if match is None or match.get(ROW_ID_COLUMN) or self.df is not None:
+                    return match
+                self.frame()
+                return self.find(*values, columns=columns)
+            mapping = self._column_map()
+            actual = {canonical: col for col, canonical in mapping.items()}
+            positions = self._index(tuple(actual.get(c, c) for c in columns)).get(tuple(normalize_key(v) for v in values))
+            if not positions:
+                return None
+            return {mapping.get(col, col): val for col, val in self.df.iloc[positions[0]].items()}
+
+    @staticmethod
+    def _index_remove(index, key, position):
+        positions = index.get(key)
+        if positions and position in positions:
+            positions.remove(position)
+            if not positions:
+                del index[key]
+
+    def _index_update(self, position, old_row, new_row):
+        for columns, index in self._indexes.items():
+            old = tuple(normalize_key(old_row.get(c, "")) for c in columns)
+            new = tuple(normalize_key(new_row.get(c, "")) for c in columns)
+            if old != new:
+                self._index_remove(index, old, position)
+                insort(index.setdefault(new, []), position)
+
+    def _index_append(self, position, row):
+        for columns, index in self._indexes.items():
+            index.setdefault(tuple(normalize_key(row.get(c, "")) for c in columns), []).append(position)
+
+    def _index_delete(self, position, row):
+        for columns, index in self._indexes.items():
+            self._index_remove(index, tuple(normalize_key(row.get(c, "")) for c in columns), position)
+            for positions in index.values():
+                for i, p in enumerate(positions):
+                    if p > position:
+                        positions[i] = p - 1
+
+    def _mark_dirty(self):
+        self._typed = None
+        self._dates = None
+        if self.dirty_since is None:
+            self.dirty_since = time.time()
+
+    def _track(self, ack):
+        """Reconcile with the backend on next read if a queued write fails."""
+        if ack is not None:
+            ack.add_done_callback(lambda f: setattr(self, "_write_failed", f.exception() is not None or self._write_failed))
+
+    def _key(self, position):
+        """Key identifying the row at `position`: its row ID, or its first column before IDs exist."""
+        df = self.df
+        if ROW_ID_COLUMN in df.columns:
+            return {ROW_ID_COLUMN: df[ROW_ID_COLUMN].iat[position]}
+        return {df.columns[0]: df.iat[position, 0]}
+
+    def update_row(self, position, values, start_col=1):
+        """Overwrite cells of the row at DataFrame `position`, starting at column `start_col` (1-based)."""
+        self.update_rows({position: values}, start_col=start_col)
+
+    def update_rows(self, updates, start_col=1):
+        """Overwrite cells of several rows ({position: values}) in one backend call."""
+        with self._lock:
+            df = self.frame()
+            changes = []
+            for position, values in updates.items():
+                columns = list(df.columns[start_col - 1:start_col - 1 + len(values)])
+                if len(columns) != len(values) or position >= len(df):
+                    raise IndexError(f"No row {position} with columns {start_col}..{start_col + len(values) - 1} in {self.name}")
+                changes.append((position, dict(zip(columns, values))))
+            if not changes:
+                return
+            ack = get_backend().update_rows(self.name, [(self._key(p), row, p) for p, row in changes])
+            df = df.copy()
+            for position, row in changes:
+                index = df.index[position]
+                old_row = df.iloc[position].to_dict()
+                for col, val in row.items():
+                    try:
+                        df.at[index, col] = val
+                    except (TypeError, ValueError):
+                        df[col] = df[col].astype(object)
+                        df.at[index, col] = val
+                self._index_update(position, old_row, {**old_row, **row})
+            self.df = df
+            self._mark_dirty()
+            self._track(ack)
+
+    def append_row(self, values):
+        """Append a row (given in column order, without its ID) to the backend and to the cached table."""
+        self.append_rows([values])
+
+    def append_rows(self, rows):
+        """Append several rows (each in column order, without its ID) in one backend call.
+
+        Returns the new rows' IDs, or None if they weren't assigned here (the table has no ID
+        column, or the rows are wider than it and the cached copy was dropped instead).
+        """
+        rows = [list(r) for r in rows]
+        if not rows:
+            return []
+        with self._lock:
+            df = self.frame()
+            if len(df.columns) < max(len(r) for r in rows):
+                get_backend().append_rows(self.name, rows)
+                self.invalidate()
+                return None
+            rows = [r + [""] * (len(df.columns) - len(r)) for r in rows]
+            row_ids = None
+            if ROW_ID_COLUMN in df.columns:
+                id_pos = df.columns.get_loc(ROW_ID_COLUMN)
+                for r in rows:
+                    r[id_pos] = new_row_id()
+                row_ids = [r[id_pos] for r in rows]
+            ack = get_backend().append_rows(self.name, rows)
+            self.df = pd.concat([df, pd.DataFrame(rows, columns=df.columns)], ignore_index=True)
+            for offset, r in enumerate(rows):
+                self._index_append(len(df) + offset, dict(zip(df.columns, r)))
+            self._mark_dirty()
+            self._track(ack)
+            return row_ids
+
+    def update_by_id(self, row_id, values, start_col=1):
+        """Overwrite cells of the row with `row_id`, wherever it currently is."""
+        with self._lock:
+            self.update_row(self.position_of(row_id), values, start_col=start_col)
+
+    def delete_by_id(self, row_id):
+        """Delete the row with `row_id`, wherever it currently is."""
+        with self._lock:
+            self.delete_row(self.position_of(row_id))
+
+    def update_by_ids(self, updates, start_col=1):
+        """Overwrite several rows ({row_id: values}) in one backend call."""
+        with self._lock:
+            self.update_rows({self.position_of(row_id): values for row_id, values in updates.items()}, start_col=start_col)
+
+    def delete_by_ids(self, row_ids):
+        """Delete several rows by ID in one backend call."""
+        with self._lock:
+            self.delete_rows([self.position_of(row_id) for row_id in row_ids])
+
+    def delete_rows(self, positions):
+        """Delete the rows at several DataFrame positions in one backend call."""
+        with self._lock:
+            df = self.frame()
+            positions = sorted({int(p) for p in positions})
+            if not positions:
+                return
+            if positions[-1] >= len(df):
+                raise IndexError(f"No row {positions[-1]} in {self.name}")
+            ack = get_backend().delete_rows(self.name, [(self._key(p), p) for p in positions])
+            self.df = df.drop(index=df.index[positions]).reset_index(drop=True)
+            self._indexes = {}
+            self._mark_dirty()
+            self._track(ack)
+
+    def delete_row(self, position):
+        """Delete the row at DataFrame `position` from the backend and the cached table."""
+        with self._lock:
+            df = self.frame()
+            if position >= len(df):
+                raise IndexError(f"No row {position} in {self.name}")
+            ack = get_backend().delete(self.name, self._key(position), position=position)
+            self._index_delete(position, df.iloc[position].to_dict())
+            self.df = df.drop(index=df.index[position]).reset_index(drop=True)
+            self._mark_dirty()
+            self._track(ack)
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _drop(table):
+    """Invalidate a table unless another thread is using it right now."""
+    if table._lock.acquire(blocking=False):
+        try:
+            table.invalidate()
+        finally:
+            table._lock.release()
+
+
+def _evict():
+    """Drop snapshots unused for SNAPSHOT_TTL, then least recently used ones while over MAX_CACHE_BYTES."""
+    now = time.time()
+    loaded = sorted((t for t in _tables.values() if t.df is not None), key=lambda t: t.used_at)
+    for table in [t for t in loaded if now - t.used_at > SNAPSHOT_TTL]:
+        _drop(table)
+        loaded.remove(table)
+    total = sum(t.nbytes for t in loaded)
+    while len(loaded) > 1 and total > MAX_CACHE_BYTES:
+        table = loaded.pop(0)
+        total -= table.nbytes
+        _drop(table)
+
+
+def get_table(name):
+    """Return the process-wide cache for a table, shared by all sessions."""
+    with _tables_lock:
+        table = _tables.get(name)
+        if table is None:
+            table = _tables[name] = TableCache(name)
+        table.used_at = time.time()
+        _evict()
+    return table
+
+
+def _warm(table, refresh, background):
+    try:
+        with quota.background() if background else nullcontext():
+            table.refresh() if refresh else table.frame()
+    except Exception:
+        pass
+
+
+def prefetch(names, refresh=False, background=False):
+    """Load several tables concurrently so the reads that follow are served from memory.
+
+    Load errors are swallowed here; the next read of that table raises them.
+    With `background`, the requests yield to interactive ones under quota pressure.
+    """
+    tables = [get_table(name) for name in names]
+    if not tables:
+        return
+    get_backend()
+    with ThreadPoolExecutor(max_workers=min(PREFETCH_WORKERS, len(tables))) as pool:
+        for table in tables:
+            pool.submit(_warm, table, refresh, background)
+
+
+_warmup_started = False
+_warmup_lock = threading.Lock()
+
+
+def start_warmup():
+    """Prefetch every known table in the background, once per process, so first page visits hit the cache."""
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    get_backend()
+    threading.Thread(target=prefetch, args=(table_names(),), kwargs={"background": True},
+                     name="table-warmup", daemon=True).start()
+
+
+_archived_on = None
+_archive_lock = threading.Lock()
+
+
+def _archive_all():
+    with quota.background():
+        for name in ARCHIVED_TABLES:
+            try:
+                get_table(name).archive_closed_years()
+            except Exception:
+                pass
+
+
+def start_archival():
+    """Run the yearly archival job in the background, at most once a day per process, if archival is enabled."""
+    global _archived_on
+    if not archive.enabled():
+        return
+    with _archive_lock:
+        if _archived_on == date.today():
+            return
+        _archived_on = date.today()
+    threading.Thread(target=_archive_all, name="table-archival", daemon=True).start()
@@ -1,21 +1,10 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-import gspread
-from google.oauth2.service_account import Credentials
+from table_cache import get_table
 
 # ---------------- Configuration ----------------
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-ws = client.open("the_great_canadian_7800k").sheet1
+challenge_table = get_table("the_great_canadian_7800k")
 
 # Challenge configuration with detailed checkpoints
 CHALLENGE_CHECKPOINTS = {
@@ -95,23 +84,22 @@ st.info(
     "To celebrate this coast-to-coast journey, log 7,800 km in total using distance-based activities such as running, walking, cycling, hiking, or any activity that tracks distance."
 )
 
-# Initialize session state
-if "challenge_data" not in st.session_state:
-    st.session_state.challenge_data = pd.DataFrame()
-
 # Load user data
 try:
-    st.session_state.challenge_data = pd.DataFrame(ws.get_all_records())
-except Exception:
-    st.session_state.challenge_data = pd.DataFrame()
+    challenge_data = challenge_table.frame()
+except Exception as e:
+    st.warning(f"Could not load your logged distances: {str(e)}")
+    challenge_data = pd.DataFrame()
+# Logged values without the row ID column, for totals, positional column fallbacks and display
+logged_data = challenge_data.drop(columns=["row_id"], errors="ignore")
 
 # Calculate total distance logged
 total_logged = 0
-if not st.session_state.challenge_data.empty:
-    if "distance_km" in st.session_state.challenge_data.columns:
-        total_logged = st.session_state.challenge_data["distance_km"].fillna(0).astype(float).sum()
-    elif len(st.session_state.challenge_data.columns) >= 2:
-        total_logged = st.session_state.challenge_data.iloc[:, 1].fillna(0).astype(float).sum()
+if not logged_data.empty:
+    if "distance_km" in logged_data.columns:
+        total_logged = logged_data["distance_km"].fillna(0).astype(float).sum()
+    elif len(logged_data.columns) >= 2:
+        total_logged = logged_data.iloc[:, 1].fillna(0).astype(float).sum()
 
 st.markdown("### Your journey progress")
 
@@ -262,7 +250,7 @@ st.markdown("### Log your kilometers")
 
 def get_existing_distance(selected_date):
     date_str = str(selected_date)
-    existing_data = st.session_state.challenge_data
+    existing_data = logged_data
     if not existing_data.empty and "date" in existing_data.columns:
         date_exists = existing_data["date"].astype(str).str.contains(date_str).any()
         if date_exists:
@@ -287,32 +275,31 @@ if st.button("Log run"):
     if distance > 0:
         try:
             date_str = str(activity_date)
-            existing_data = st.session_state.challenge_data
+            existing_data = challenge_data
 
             if not existing_data.empty and "date" in existing_data.columns:
                 date_exists = existing_data["date"].astype(str).str.contains(date_str).any()
                 if date_exists:
-                    row_index = existing_data[existing_data["date"].astype(str) == date_str].index[0]
+                    row_id = existing_data.loc[existing_data["date"].astype(str) == date_str, "row_id"].iloc[0]
                     if "distance_km" in existing_data.columns:
-                        ws.update(f"B{row_index + 2}", [[distance]])
+                        challenge_table.update_by_id(row_id, [distance], start_col=2)
                     else:
-                        ws.update(f"A{row_index + 2}:B{row_index + 2}", [[date_str, distance]])
+                        challenge_table.update_by_id(row_id, [date_str, distance])
                     st.success(f"Updated run for {activity_date}.")
                 else:
-                    ws.append_row([date_str, distance])
+                    challenge_table.append_row([date_str, distance])
                     st.success(f"Added new run for {activity_date}.")
             else:
-                ws.append_row([date_str, distance])
+                challenge_table.append_row([date_str, distance])
                 st.success(f"Added new run for {activity_date}.")
 
-            st.session_state.challenge_data = pd.DataFrame(ws.get_all_records())
             st.rerun()
         except Exception as e:
             st.error(f"Error saving data: {str(e)}")
 
-if not st.session_state.challenge_data.empty:
+if not challenge_data.empty:
     with st.expander("Recent Runs", expanded=False):
-        df_display = st.session_state.challenge_data.copy()
+        df_display = logged_data.copy()
         if "date" not in df_display.columns and len(df_display.columns) >= 2:
             df_display.columns = ["date", "distance_km"] + list(df_display.columns[2:])
         if "date" in df_display.columns:
@@ -1,26 +1,14 @@
 import streamlit as st
-import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
+from table_cache import get_table
 import base64
 from io import BytesIO
-from PIL import Image
 
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-creds = Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=SCOPES
-)
-client = gspread.authorize(creds)
-ws = client.open("vision_board").sheet1
+vision_table = get_table("vision_board")
 
 def compress_image(image_file, max_size_kb=30):
     try:
+        from PIL import Image
         image = Image.open(image_file)
         
         if image.mode in ('RGBA', 'LA', 'P'):
@@ -54,8 +42,7 @@ def compress_image(image_file, max_size_kb=30):
 
 def get_image_from_base64(image_data):
     try:
-        image_bytes = base64.b64decode(image_data)
-        return Image.open(BytesIO(image_bytes))
+        return base64.b64decode(image_data, validate=True)
     except Exception as e:
         st.error(f"Error loading image from base64: {str(e)}")
         return None
@@ -68,7 +55,7 @@ def upload_pending_images():
                 try:
                     compressed_data = compress_image(new_image)
                     if compressed_data:
-                        ws.append_row([compressed_data])
+                        vision_table.append_row([compressed_data])
                         uploaded_count += 1
                         
                         if "uploaded_files" not in st.session_state:
@@ -81,117 +68,111 @@ def upload_pending_images():
         
         if uploaded_count > 0:
             st.success(f"{uploaded_count} image(s) added to your vision board!")
-            st.session_state.vision_board_df = pd.DataFrame(ws.get_all_records())
             return True
     return False
 
-if "vision_board_df" not in st.session_state:
-    st.session_state.vision_board_df = pd.DataFrame(ws.get_all_records())
-
-df = st.session_state.vision_board_df.copy()
+df = vision_table.typed()
 
 st.title("🎨 Vision Board")
 
 if not df.empty:
-    image_col = None
-    for col in df.columns:
-        if col.lower() in ['image', 'image_data', 'picture', 'photo', 'file_id']:
-            image_col = col
-            break
-    
-    if image_col is None and len(df.columns) > 0:
-        image_col = df.columns[0]
-    
-    if image_col is None:
-        st.error("No data found. Please add some images.")
-    else:
-        images_per_row = 3
-        for i in range(0, len(df), images_per_row):
-            cols = st.columns(images_per_row)
-            for j, col in enumerate(cols):
-                if i + j < len(df):
-                    idx = i + j
-                    row = df.iloc[idx]
-                    image_data = row.get(image_col, '')
-                    
-                    if image_data:
-                        with col:
-                            try:
-                                image = get_image_from_base64(image_data)
-                                if image:
-                                    st.image(image, width='stretch')
-                                else:
-                                    st.error("Could not load image")
-                                
-                                if st.session_state.get("show_management", False):
-                                    col_edit, col_delete = st.columns([1, 1])
-                                    with col_edit:
-                                        if st.button("✏️", key=f"edit_{idx}", help="Edit", width='stretch'):
-                                            st.session_state[f"editing_{idx}"] = True
-                                    with col_delete:
-                                        if st.button("🗑️", key=f"delete_{idx}", help="Delete", width='stretch'):
+    images_per_row = 3
+    for i in range(0, len(df), images_per_row):
+        cols = st.columns(images_per_row)
+        for j, col in enumerate(cols):
+            if i + j < len(df):
+                idx = i + j
+                row = df.iloc[idx]
+                row_id = row["row_id"]
+                image_data = row.get("image_data", '')
+                
+                if image_data:
+                    with col:
+                        try:
+                            image = get_image_from_base64(image_data)
+                            if image:
+                                st.image(image, width='stretch')
+                            else:
+                                st.error("Could not load image")
+                            
+                            if st.session_state.get("show_management", False):
+                                col_edit, col_delete = st.columns([1, 1])
+                                with col_edit:
+                                    if st.button("✏️", key=f"edit_{row_id}", help="Edit", width='stretch'):
+                                        st.session_state[f"editing_{row_id}"] = True
+                                with col_delete:
+                                    if st.button("🗑️", key=f"delete_{row_id}", help="Delete", width='stretch'):
+                                        try:
+                                            vision_table.delete_by_id(row_id)
+                                            st.success("Image deleted.")
+                                            st.rerun()
+                                        except Exception as e:
+                                            st.error(f"Error deleting image: {str(e)}")
+                                st.checkbox("Select", key=f"select_{row_id}")
+                            
+                            if st.session_state.get(f"editing_{row_id}", False):
+                                with st.expander(f"Edit Image {idx + 1}", expanded=True):
+                                    edit_image = st.file_uploader("Upload new image", type=['png', 'jpg', 'jpeg'], key=f"edit_image_{row_id}")
+                                    
+                                    edit_save_col, edit_cancel_col = st.columns([1, 1])
+                                    with edit_save_col:
+                                        if st.button("☁️ Save changes", key=f"save_edit_{row_id}"):
                                             try:
-                                                ws.delete_rows(idx + 2)
-                                                st.success("Image deleted.")
-                                                st.session_state.vision_board_df = pd.DataFrame(ws.get_all_records())
-                                                st.rerun()
-                                            except Exception as e:
-                                                st.error(f"Error deleting image: {str(e)}")
-                                
-                                if st.session_state.get(f"editing_{idx}", False):
-                                    with st.expander(f"Edit Image {idx + 1}", expanded=True):
-                                        edit_image = st.file_uploader("Upload new image", type=['png', 'jpg', 'jpeg'], key=f"edit_image_{idx}")
-                                        
-                                        edit_save_col, edit_cancel_col = st.columns([1, 1])
-                                        with edit_save_col:
-                                            if st.button("☁️ Save changes", key=f"save_edit_{idx}"):
-                                                try:
-                                                    if edit_image:
-                                                        compressed_data = compress_image(edit_image)
-                                                        if compressed_data:
-                                                            ws.update(values=[[compressed_data]], 
-                                                                     range_name=f"A{idx+2}")
-                                                            st.success("Image updated.")
-                                                            st.session_state[f"editing_{idx}"] = False
-                                                            st.session_state.vision_board_df = pd.DataFrame(ws.get_all_records())
-                                                            st.rerun()
-                                                        else:
-                                                            st.error("Failed to compress image.")
+                                                if edit_image:
+                                                    compressed_data = compress_image(edit_image)
+                                                    if compressed_data:
+                                                        vision_table.update_by_id(row_id, [compressed_data])
+                                                        st.success("Image updated.")
+                                                        st.session_state[f"editing_{row_id}"] = False
+                                                        st.rerun()
                                                     else:
-                                                        st.warning("Please select a new image.")
-                                                except Exception as e:
-                                                    st.error(f"Error updating image: {str(e)}")
-                                        
-                                        with edit_cancel_col:
-                                            if st.button("❌ Cancel", key=f"cancel_edit_{idx}"):
-                                                st.session_state[f"editing_{idx}"] = False
-                                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Image could not be displayed: {str(e)}")
-        
-        if st.session_state.get("show_management", False):
-            new_images = st.file_uploader("Upload images", type=['png', 'jpg', 'jpeg'], key="new_image_input", accept_multiple_files=True)
-            
-            if new_images:
-                st.session_state["pending_images"] = new_images
-        
-        col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            if st.button("⚙️ Manage vision board", help="Edit or delete images", disabled=st.session_state.get("show_management", False)):
-                st.session_state["show_management"] = True
+                                                        st.error("Failed to compress image.")
+                                                else:
+                                                    st.warning("Please select a new image.")
+                                            except Exception as e:
+                                                st.error(f"Error updating image: {str(e)}")
+                                    
+                                    with edit_cancel_col:
+                                        if st.button("❌ Cancel", key=f"cancel_edit_{row_id}"):
+                                            st.session_state[f"editing_{row_id}"] = False
+                                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Image could not be displayed: {str(e)}")
+    
+    if st.session_state.get("show_management", False):
+        selected = [row_id for row_id in df["row_id"] if st.session_state.get(f"select_{row_id}", False)]
+        if st.button(f"🗑️ Delete selected ({len(selected)})", disabled=not selected):
+            try:
+                vision_table.delete_by_ids(selected)
+                for row_id in selected:
+                    st.session_state.pop(f"select_{row_id}", None)
+                st.success(f"{len(selected)} image(s) deleted.")
                 st.rerun()
+            except Exception as e:
+                st.error(f"Error deleting images: {str(e)}")
+        
+        new_images = st.file_uploader("Upload images", type=['png', 'jpg', 'jpeg'], key="new_image_input", accept_multiple_files=True)
         
-        with col2:
-            if st.session_state.get("show_management", False):
-                if st.button("☁️ Done", help="Close management"):
-                    if upload_pending_images():
-                        st.rerun()
-                    
-                    st.session_state["show_management"] = False
-                    st.session_state.uploaded_files = []
-                    st.session_state["pending_images"] = []
+        if new_images:
+            st.session_state["pending_images"] = new_images
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        if st.button("⚙️ Manage vision board", help="Edit or delete images", disabled=st.session_state.get("show_management", False)):
+            st.session_state["show_management"] = True
+            st.rerun()
+    
+    with col2:
+        if st.session_state.get("show_management", False):
+            if st.button("☁️ Done", help="Close management"):
+                if upload_pending_images():
                     st.rerun()
+                
+                st.session_state["show_management"] = False
+                st.session_state.uploaded_files = []
+                st.session_state["pending_images"] = []
+                st.rerun()
 
 else:
     st.info("No images yet. Click **Manage vision board** to add your first.")
@@ -0,0 +1,372 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from numbers import Number
+from quota import is_rejected, single_attempt
+from sheets_client import sheets_client
+
+# Seconds the background writer waits for a burst of edits to accumulate before flushing.
+FLUSH_INTERVAL = 0.5
+# Upper bound in seconds between replay attempts while the remote sheet keeps failing.
+MAX_RETRY_DELAY = 300
+# Most rows coalesce() merges into one appendCells request, so bulk imports stay in modest batches.
+MAX_APPEND_ROWS = 500
+
+JOURNAL_PATH = os.path.join("data", "write_journal.db")
+
+
+def cell_value(value):
+    """Convert a Python value to a Sheets CellData, stored as entered (like RAW input)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value == "":
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, Number):
+        return {"userEnteredValue": {"numberValue": float(value)}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def update_cells_request(sheet_id, row_index, col_index, values):
+    """batchUpdate request writing one row of values at a 0-based grid coordinate."""
+    return {"updateCells": {
+        "start": {"sheetId": sheet_id, "rowIndex": row_index, "columnIndex": col_index},
+        "rows": [{"values": [cell_value(v) for v in values]}],
+        "fields": "userEnteredValue",
+    }}
+
+
+def update_column_request(sheet_id, row_index, col_index, values):
+    """batchUpdate request writing values down one column from a 0-based grid coordinate."""
+    return {"updateCells": {
+        "start": {"sheetId": sheet_id, "rowIndex": row_index, "columnIndex": col_index},
+        "rows": [{"values": [cell_value(v)]} for v in values],
+        "fields": "userEnteredValue",
+    }}
+
+
+def append_cells_request(sheet_id, rows):
+    """batchUpdate request appending rows after the last row with data."""
+    return {"appendCells": {
+        "sheetId": sheet_id,
+        "rows": [{"values": [cell_value(v) for v in row]} for row in rows],
+        "fields": "userEnteredValue",
+    }}
+
+
+def delete_rows_request(sheet_id, start_index, end_index):
+    """batchUpdate request deleting grid rows [start_index, end_index) (0-based)."""
+    return {"deleteDimension": {
+        "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start_index, "endIndex": end_index},
+    }}
+
+
+def update_row_op(sheet_id, id_col, row_id, runs):
+    """Journal op writing column runs [(col_index, values)] into the row with `row_id` in column `id_col`."""
+    return {"updateRow": {"sheetId": sheet_id, "idColumn": id_col, "rowId": str(row_id), "runs": runs}}
+
+
+def delete_rows_op(sheet_id, id_col, row_ids):
+    """Journal op deleting the rows with the given IDs in column `id_col`."""
+    return {"deleteRows": {"sheetId": sheet_id, "idColumn": id_col, "rowIds": [str(r) for r in row_ids]}}
+
+
+def append_rows_op(sheet_id, id_col, rows):
+    """Journal op appending rows; `id_col` is where each row carries its ID (None before IDs exist)."""
+    return {"appendRows": {"sheetId": sheet_id, "idColumn": id_col, "rows": rows}}
+
+
+def fill_column_op(sheet_id, col_index, values):
+    """Journal op overwriting a column for every data row, in sheet order."""
+    return {"fillColumn": {"sheetId": sheet_id, "columnIndex": col_index, "values": values}}
+
+
+def id_column(requests):
+    """Return the row ID column that the ops in `requests` address rows by, or None if none do."""
+    for req in requests:
+        op = req.get("updateRow") or req.get("deleteRows") or req.get("appendRows")
+        if op and op["idColumn"] is not None:
+            return op["idColumn"]
+    return None
+
+
+def resolve(requests, row_ids, id_col=None):
+    """Translate journal ops into batchUpdate requests against the sheet as it is now.
+
+    `row_ids` is the sheet's row ID column (data rows, top to bottom) read just before
+    sending, so rows are located where they are at replay time rather than where they
+    were when the write was queued. Updates and deletes of rows that no longer exist
+    are dropped. Plain batchUpdate requests pass through unchanged. Returns the
+    requests and the row IDs the sheet will have once they are applied.
+    """
+    ids = [str(v) for v in row_ids]
+    where = {v: i for i, v in enumerate(ids)}
+    resolved = []
+    for req in requests:
+        if "updateRow" in req:
+            op = req["updateRow"]
+            if op["rowId"] in where:
+                row_index = where[op["rowId"]] + 1
+                resolved.extend(update_cells_request(op["sheetId"], row_index, col, values) for col, values in op["runs"])
+        elif "deleteRows" in req:
+            op = req["deleteRows"]
+            positions = sorted(where[r] for r in set(op["rowIds"]) if r in where)
+            # Contiguous runs, deleted bottom-up so the remaining indices stay valid.
+            runs = []
+            for p in positions:
+                if runs and p == runs[-1][1] + 1:
+                    runs[-1][1] = p
+                else:
+                    runs.append([p, p])
+            for start, end in reversed(runs):
+                resolved.append(delete_rows_request(op["sheetId"], start + 1, end + 2))
+                del ids[start:end + 1]
+            if runs:
+                where = {v: i for i, v in enumerate(ids)}
+        elif "appendRows" in req:
+            op = req["appendRows"]
+            rows = op["rows"]
+            if op["idColumn"] is not None:
+                # Rows whose ID is already in the sheet landed on an earlier attempt; don't append them twice.
+                rows = [row for row in rows if str(row[op["idColumn"]]) not in where]
+                for row in rows:
+                    where[str(row[op["idColumn"]])] = len(ids)
+                    ids.append(str(row[op["idColumn"]]))
+            if rows:
+                resolved.append(append_cells_request(op["sheetId"], rows))
+        elif "fillColumn" in req:
+            op = req["fillColumn"]
+            resolved.append(update_column_request(op["sheetId"], 1, op["columnIndex"], op["values"]))
+            if op["columnIndex"] == id_col:
+                ids = [str(v) for v in op["values"]]
+                where = {v: i for i, v in enumerate(ids)}
+        else:
+            resolved.append(req)
+    return resolved, ids
+
+
+def append_batches(items):
+    """Split (entry id, ops) journal entries into consecutive groups appending at most MAX_APPEND_ROWS rows each."""
+    group, appended = [], 0
+    for entry_id, reqs in items:
+        rows = sum(len((r.get("appendRows") or r.get("appendCells") or {}).get("rows", [])) for r in reqs)
+        if group and appended + rows > MAX_APPEND_ROWS:
+            yield group
+            group, appended = [], 0
+        group.append((entry_id, reqs))
+        appended += rows
+    if group:
+        yield group
+
+
+def coalesce(requests):
+    """Merge consecutive appends (up to MAX_APPEND_ROWS rows each) and drop updates overwritten by an identical later update."""
+    merged = []
+    for req in requests:
+        prev = merged[-1] if merged else None
+        if prev and "appendCells" in req and "appendCells" in prev \
+                and prev["appendCells"]["sheetId"] == req["appendCells"]["sheetId"] \
+                and len(prev["appendCells"]["rows"]) + len(req["appendCells"]["rows"]) <= MAX_APPEND_ROWS:
+            prev["appendCells"]["rows"].extend(req["appendCells"]["rows"])
+            continue
+        if prev and "updateCells" in req and "updateCells" in prev \
+                and prev["updateCells"]["start"] == req["updateCells"]["start"] \
+                and len(prev["updateCells"]["rows"][0]["values"]) == len(req["updateCells"]["rows"][0]["values"]):
+            merged[-1] = req
+            continue
+        merged.append(req)
+    return merged
+
+
+class WriteQueue:
+    """Write-behind queue backed by a local journal.
+
+    Mutations are committed to a SQLite (WAL) journal before submit() returns, then
+    replayed in order, grouped per spreadsheet into one batch_update. Row ops name
+    their rows by ID and are resolved to grid rows only when sent. Entries stay in
+    the journal until the remote write succeeds, so they survive outages, throttling
+    and restarts. Entries the API explicitly rejects (4xx) are moved to a dead_letter
+    table with the error, never silently deleted.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, path=JOURNAL_PATH):
+        self.flush_interval = flush_interval
+        self.path = path
+        self._conn = None
+        self._futures = {}
+        self._revisions = {}
+        self._failures = 0
+        self._retry_at = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def _journal(self, create=True):
+        """Return the journal connection, opening it on first use; None if it doesn't exist and `create` is False."""
+        if self._conn is None:
+            if not create and not os.path.exists(self.path):
+                return None
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS journal ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, "
+                "requests TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letter ("
+                "id INTEGER PRIMARY KEY, table_name TEXT NOT NULL, requests TEXT NOT NULL, "
+                "created_at REAL NOT NULL, failed_at REAL NOT NULL, error TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def start(self):
+        """Resume replaying a journal left over from a previous run, if there is one."""
+        if self.pending():
+            with self._cond:
+                self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sheets-write-queue", daemon=True)
+            self._thread.start()
+
+    def submit(self, name, requests):
+        """Journal batchUpdate requests for a table; the Future resolves once they are written remotely."""
+        future = Future()
+        with self._cond:
+            with self._journal():
+                entry_id = self._conn.execute(
+                    "INSERT INTO journal (table_name, requests, created_at) VALUES (?, ?, ?)",
+                    (name, json.dumps(list(requests)), time.time()),
+                ).lastrowid
+            self._futures[entry_id] = future
+            self._ensure_worker()
+            self._cond.notify()
+        return future
+
+    def landed_revision(self, name):
+        """Spreadsheet modifiedTime read right after this queue's last successful flush of `name`, or None."""
+        with self._cond:
+            return self._revisions.get(name)
+
+    def rejected(self, name=None):
+        """Return dead-lettered entries as (id, table_name, requests, failed_at, error), oldest first."""
+        with self._cond:
+            conn = self._journal(create=False)
+            if conn is None:
+                return []
+            sql = "SELECT id, table_name, requests, failed_at, error FROM dead_letter"
+            if name:
+                return conn.execute(sql + " WHERE table_name = ? ORDER BY id", (name,)).fetchall()
+            return conn.execute(sql + " ORDER BY id").fetchall()
+
+    def pending(self, name=None):
+        """Return True if journaled mutations are waiting to be written (for `name`, or any table)."""
+        with self._cond:
+            conn = self._journal(create=False)
+            if conn is None:
+                return False
+            if name:
+                row = conn.execute("SELECT 1 FROM journal WHERE table_name = ? LIMIT 1", (name,)).fetchone()
+            else:
+                row = conn.execute("SELECT 1 FROM journal LIMIT 1").fetchone()
+        return row is not None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._conn.execute("SELECT 1 FROM journal LIMIT 1").fetchone():
+                    self._cond.wait()
+            time.sleep(max(self.flush_interval, self._retry_at - time.time()))
+            self.flush()
+
+    def _finish(self, ids, error=None):
+        """Remove entries from the journal, parking them in dead_letter if they were rejected."""
+        with self._cond:
+            with self._conn:
+                if error is not None:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO dead_letter (id, table_name, requests, created_at, failed_at, error) "
+                        "SELECT id, table_name, requests, created_at, ?, ? FROM journal WHERE id = ?",
+                        [(time.time(), repr(error), i) for i in ids],
+                    )
+                self._conn.executemany("DELETE FROM journal WHERE id = ?", [(i,) for i in ids])
+            futures = [self._futures.pop(i) for i in ids if i in self._futures]
+        for future in futures:
+            if error is None:
+                future.set_result(True)
+            else:
+                future.set_exception(error)
+
+    def flush(self, name=None):
+        """Replay journaled mutations now (for `name`, or every table) and wait for the result.
+
+        Does nothing while backing off after a transient failure. Each batch is sent once;
+        a failed one is retried on a later flush, after its rows are located again.
+        """
+        if time.time() < self._retry_at:
+            return
+        with self._flush_lock:
+            with self._cond:
+                if self._journal(create=False) is None:
+                    return
+                if name:
+                    rows = self._conn.execute(
+                        "SELECT id, table_name, requests FROM journal WHERE table_name = ? ORDER BY id", (name,)
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute("SELECT id, table_name, requests FROM journal ORDER BY id").fetchall()
+            batches = {}
+            for entry_id, table_name, requests in rows:
+                batches.setdefault(table_name, []).append((entry_id, json.loads(requests)))
+            for table_name, items in batches.items():
+                id_col = id_column([r for _, reqs in items for r in reqs])
+                row_ids = None
+                sent = failed = False
+                # One batch_update per group, so a bulk import goes out in chunks rather than one huge request.
+                for group in append_batches(items):
+                    ids = [entry_id for entry_id, _ in group]
+                    try:
+                        if row_ids is None:
+                            row_ids = sheets_client.worksheet(table_name).col_values(id_col + 1)[1:] if id_col is not None else []
+                        requests, after = resolve([r for _, reqs in group for r in reqs], row_ids, id_col)
+                        requests = coalesce(requests)
+                        if requests:
+                            with single_attempt():
+                                sheets_client.spreadsheet(table_name).batch_update({"requests": requests})
+                    except Exception as e:
+                        if not is_rejected(e):
+                            # Outages, throttling and anything unrecognized: keep this and later entries;
+                            # the worker retries with growing delays.
+                            self._failures += 1
+                            self._retry_at = time.time() + min(MAX_RETRY_DELAY, 2 ** self._failures)
+                            failed = True
+                            break
+                        self._finish(ids, e)
+                        row_ids = None
+                    else:
+                        self._failures = 0
+                        self._retry_at = 0
+                        sent = sent or bool(requests)
+                        self._finish(ids)
+                        row_ids = after
+                if sent and not failed:
+                    # Readers compare this with the sheet's revision to tell our own writes from outside edits.
+                    try:
+                        revision = sheets_client.spreadsheet(table_name).get_lastUpdateTime()
+                    except Exception:
+                        revision = None
+                    with self._cond:
+                        self._revisions[table_name] = revision
+
+
+write_queue = WriteQueue()